@@ -0,0 +1,308 @@
+import asyncio
+import json
+import random
+import threading
+from concurrent.futures import as_completed
+
+from analysis_cache import cache_key
+
+ANALYSIS_MODEL = "llama-3.3-70b-versatile"
+ANALYSIS_MAX_TOKENS = 350
+ANALYSIS_TEMPERATURE = 0.7
+
+# Batched portfolio mode: many customers per request, one JSON section each
+BATCH_SECTIONS = [
+    ("risk_assessment", "RISK ASSESSMENT"),
+    ("revenue_opportunity", "REVENUE OPPORTUNITY"),
+    ("market_timing", "MARKET TIMING"),
+    ("strategic_recommendation", "STRATEGIC RECOMMENDATION"),
+]
+BATCH_OUTPUT_TOKENS_PER_CUSTOMER = 160
+BATCH_MAX_OUTPUT_TOKENS = 8000
+BATCH_MAX_PROMPT_TOKENS = 24000
+
+
+def build_analysis_prompt(customer, market_data):
+    """Per-customer strategic analysis prompt"""
+    return f"""As a senior Synchrony credit analyst, provide strategic recommendations for this customer:
+
+Customer Profile:
+• Name: {customer['name']}
+• Current Limit: ₹{customer['current_limit']:,}
+• Utilization: {customer['utilization']:.0%}
+• Income: ₹{customer['income']:,}
+• Risk Score: {customer['risk_score']}
+• Payment History: {customer['payment_history']}%
+• Primary Spending: {customer.get('spending_category', 'Mixed')}
+• Market Context: {customer['market_context']}
+• Current Market: S&P {market_data['sp500_change']:+.1f}%, VIX {market_data['vix_level']:.1f}
+
+Provide analysis in these 4 sections (2-3 lines each):
+
+1. RISK ASSESSMENT:
+2. REVENUE OPPORTUNITY:
+3. MARKET TIMING:
+4. STRATEGIC RECOMMENDATION:
+
+Keep response concise and actionable.
+"""
+
+
+def batch_preamble(market_data):
+    """Shared instructions sent once per batch instead of once per customer"""
+    fields = ", ".join(f'"{field}": "..."' for field, _ in BATCH_SECTIONS)
+    return f"""As a senior Synchrony credit analyst, provide strategic recommendations for each customer below.
+Current Market: S&P {market_data['sp500_change']:+.1f}%, VIX {market_data['vix_level']:.1f}
+
+For every customer give 1-2 concise, actionable lines for each of: risk assessment, revenue opportunity,
+market timing and strategic recommendation.
+
+Respond with JSON only, in the form {{"analyses": [{{"id": "<customer id>", {fields}}}, ...]}}
+with exactly one entry per customer id.
+
+Customers:
+"""
+
+
+def batch_profile_line(customer):
+    """One compact profile line per customer for batched prompts"""
+    return (f"- id={customer['id']} | name={customer['name']} | limit=₹{customer['current_limit']:,} | "
+            f"utilization={customer['utilization']:.0%} | income=₹{customer['income']:,} | "
+            f"risk={customer['risk_score']} | payment_history={customer['payment_history']}% | "
+            f"spending={customer.get('spending_category', 'Mixed')} | context={customer['market_context']}\n")
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+def plan_batches(customers, market_data, max_prompt_tokens=BATCH_MAX_PROMPT_TOKENS,
+                 max_output_tokens=BATCH_MAX_OUTPUT_TOKENS, output_tokens_per_customer=BATCH_OUTPUT_TOKENS_PER_CUSTOMER):
+    """Pack customers into batched prompts that fit the model's context and output limits
+
+    Returns a list of (prompt, customer_ids, max_tokens) tuples.
+    """
+    preamble = batch_preamble(market_data)
+    per_batch = max(1, max_output_tokens // output_tokens_per_customer)
+    batches = []
+    lines, ids, tokens = [], [], estimate_tokens(preamble)
+    for customer in customers:
+        line = batch_profile_line(customer)
+        line_tokens = estimate_tokens(line)
+        if ids and (len(ids) >= per_batch or tokens + line_tokens > max_prompt_tokens):
+            batches.append((preamble + "".join(lines), ids, len(ids) * output_tokens_per_customer))
+            lines, ids, tokens = [], [], estimate_tokens(preamble)
+        lines.append(line)
+        ids.append(customer['id'])
+        tokens += line_tokens
+    if ids:
+        batches.append((preamble + "".join(lines), ids, len(ids) * output_tokens_per_customer))
+    return batches
+
+
+def parse_batch_response(text, customer_ids):
+    """Split a batched JSON response into per-customer analyses in the single-customer section format
+
+    Customers missing from the response are left out of the returned dict.
+    """
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError:
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            return {}
+        try:
+            payload = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            return {}
+
+    entries = payload.get("analyses", []) if isinstance(payload, dict) else payload
+    wanted = set(customer_ids)
+    analyses = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict) or str(entry.get("id")) not in wanted:
+            continue
+        sections = [f"{n}. {title}:\n{str(entry.get(field, '')).strip()}"
+                    for n, (field, title) in enumerate(BATCH_SECTIONS, start=1)]
+        analyses[str(entry["id"])] = "\n\n".join(sections)
+    return analyses
+
+
+def stream_analysis(client, prompt, cache=None, model=ANALYSIS_MODEL,
+                    max_tokens=ANALYSIS_MAX_TOKENS, temperature=ANALYSIS_TEMPERATURE):
+    """Yield analysis text incrementally as tokens arrive from a (sync) Groq client
+
+    A cache hit yields the whole cached analysis at once; a completed stream
+    is written back to the cache.
+    """
+    key = cache_key(prompt, model, max_tokens=max_tokens, temperature=temperature)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    stream = client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=max_tokens,
+        temperature=temperature,
+        stream=True
+    )
+    parts = []
+    for chunk in stream:
+        token = chunk.choices[0].delta.content if chunk.choices else None
+        if token:
+            parts.append(token)
+            yield token
+    if cache is not None:
+        cache.put(key, model, "".join(parts))
+
+
+def retryable_errors():
+    """Groq errors worth retrying (groq is imported on first use; it is slow to import)"""
+    from groq import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+    return (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+
+def retry_delay(error, attempt, base_delay):
+    """Seconds to wait before retrying: the server's Retry-After if given, else exponential backoff with jitter"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return base_delay * (2 ** attempt) * (0.5 + random.random())
+
+
+class AnalysisQueue:
+    """Concurrent Groq analysis requests on a background event loop
+
+    At most ``concurrency`` requests are in flight at once; rate limits and
+    transient errors are retried with backoff. ``submit`` returns a
+    concurrent.futures.Future and, when a ``results`` dict is given, writes
+    the analysis into it under ``key`` as soon as it completes. With a
+    ``cache`` (an AnalysisCache), identical requests are answered without
+    calling Groq.
+    """
+
+    def __init__(self, api_key, concurrency=8, max_retries=5, base_delay=1.0,
+                 model=ANALYSIS_MODEL, max_tokens=ANALYSIS_MAX_TOKENS, temperature=ANALYSIS_TEMPERATURE,
+                 cache=None):
+        self.api_key = api_key
+        self.cache = cache
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="analysis-queue", daemon=True)
+        self._thread.start()
+        self._client = None
+        self._semaphore = None
+
+    async def _complete(self, prompt, max_tokens=None, response_format=None):
+        if self._client is None:
+            from groq import AsyncGroq
+
+            # Created on the loop thread so the underlying HTTP pool binds to this loop
+            self._client = AsyncGroq(api_key=self.api_key, max_retries=0)
+            self._retryable = retryable_errors()
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                try:
+                    extra = {"response_format": response_format} if response_format else {}
+                    response = await self._client.chat.completions.create(
+                        model=self.model,
+                        messages=[{"role": "user", "content": prompt}],
+                        max_tokens=max_tokens or self.max_tokens,
+                        temperature=self.temperature,
+                        **extra
+                    )
+                    return response.choices[0].message.content
+                except self._retryable as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    delay = retry_delay(e, attempt, self.base_delay)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def request_key(self, prompt, max_tokens=None, response_format=None):
+        """Content address for this queue's model and sampling parameters"""
+        params = {"max_tokens": max_tokens or self.max_tokens, "temperature": self.temperature}
+        if response_format:
+            params["response_format"] = response_format
+        return cache_key(prompt, self.model, **params)
+
+    async def _cached_complete(self, prompt, max_tokens=None, response_format=None, accept=None):
+        """Completion text, from the cache if possible
+
+        Replies for which ``accept(text)`` is false are never cached (and a
+        cached one is treated as a miss), so a truncated or malformed reply
+        is re-requested next time instead of being served until it expires.
+        """
+        if self.cache is None:
+            return await self._complete(prompt, max_tokens, response_format)
+        request_key = self.request_key(prompt, max_tokens, response_format)
+        text = await asyncio.to_thread(self.cache.get, request_key)
+        if text is not None and (accept is None or accept(text)):
+            return text
+        text = await self._complete(prompt, max_tokens, response_format)
+        if accept is None or accept(text):
+            await asyncio.to_thread(self.cache.put, request_key, self.model, text)
+        return text
+
+    async def _run(self, key, prompt, results):
+        analysis = await self._cached_complete(prompt)
+        if results is not None:
+            results[key] = analysis
+        return analysis
+
+    def submit(self, key, prompt, results=None):
+        """Queue one analysis; returns a Future resolving to the analysis text"""
+        return asyncio.run_coroutine_threadsafe(self._run(key, prompt, results), self._loop)
+
+    def submit_many(self, prompts, results=None):
+        """Queue many analyses at once; returns {key: Future}"""
+        return {key: self.submit(key, prompt, results) for key, prompt in prompts.items()}
+
+    async def _run_batch(self, prompt, customer_ids, max_tokens, results):
+        wanted = {str(cid) for cid in customer_ids}
+        text = await self._cached_complete(prompt, max_tokens, {"type": "json_object"},
+                                           accept=lambda reply: parse_batch_response(reply, wanted).keys() == wanted)
+        analyses = parse_batch_response(text, customer_ids)
+        if results is not None:
+            results.update(analyses)
+        return analyses
+
+    def submit_batches(self, batches, results=None):
+        """Queue batched prompts from plan_batches; returns {batch number: Future of {customer id: analysis}}"""
+        return {
+            n: asyncio.run_coroutine_threadsafe(self._run_batch(prompt, ids, max_tokens, results), self._loop)
+            for n, (prompt, ids, max_tokens) in enumerate(batches)
+        }
+
+
+def wait_for(futures, on_done=None):
+    """Block until every future finishes, calling ``on_done(key, error)`` in completion order
+
+    Returns {key: error} for the analyses that failed.
+    """
+    keys = {future: key for key, future in futures.items()}
+    errors = {}
+    for future in as_completed(keys):
+        key = keys[future]
+        error = future.exception()
+        if error is not None:
+            errors[key] = error
+        if on_done is not None:
+            on_done(key, error)
+    return errors
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_access ON analysis_cache (last_access);
+CREATE INDEX IF NOT EXISTS idx_analysis_cache_created_at ON analysis_cache (created_at);
+"""
+
+
+def cache_key(prompt, model, **params):
+    """Content address of a completion request: prompt, model and sampling parameters"""
+    payload = json.dumps({"prompt": prompt, "model": model, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """Persistent LLM response cache keyed by a hash of the full request
+
+    Entries expire after ``ttl`` seconds; beyond ``max_entries`` or
+    ``max_bytes`` the least recently used entries are evicted. Hit and miss
+    counters are kept per process.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=10000, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def get(self, key):
+        """Cached response for key, or None (expired entries count as misses)"""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM analysis_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and (self.ttl is None or now - row[1] <= self.ttl):
+                self._conn.execute("UPDATE analysis_cache SET last_access = ? WHERE key = ?", (now, key))
+                self.hits += 1
+                return row[0]
+            if row is not None:
+                self._conn.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+            self.misses += 1
+            return None
+
+    def put(self, key, model, response):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, model, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, len(response.encode("utf-8")), now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM analysis_cache WHERE created_at < ?", (now - self.ttl,))
+        count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analysis_cache").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        # Walk the last_access index from the least recently used entry and stop as soon as both limits
+        # hold, so only the rows being evicted are read
+        evicted = []
+        cursor = self._conn.execute("SELECT key, size FROM analysis_cache ORDER BY last_access")
+        for key, entry_size in cursor:
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            count -= 1
+            size -= entry_size
+            evicted.append((key,))
+        cursor.close()
+        self._conn.executemany("DELETE FROM analysis_cache WHERE key = ?", evicted)
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM analysis_cache")
+
+    def stats(self):
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analysis_cache"
+            ).fetchone()
+        return {"entries": count, "bytes": size, "hits": self.hits, "misses": self.misses}
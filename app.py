@@ -1,23 +1,12 @@
 import streamlit as st
 import os
 import json
-import plotly.graph_objects as go
-import plotly.express as px
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-import time
-import random
+from datetime import datetime
 from dotenv import load_dotenv
-from groq import Groq
-import yfinance as yf
-import io
-import requests
 from urllib.parse import urlencode
-import base64
-import hashlib
-
-USD_TO_INR = 83  # 1 USD = 83 INR (update as needed)
+from config import Config
+from flash import flash_and_rerun, show_flashed
+from sessions import SESSION_COOKIE, SessionStore
 
 load_dotenv()
 
@@ -64,21 +53,48 @@ def exchange_code_for_token(auth_code):
     }
     
     try:
-        response = requests.post(token_url, data=token_data)
+        from http_client import get_session
+
+        response = get_session().post(token_url, data=token_data)
         return response.json()
     except Exception as e:
         st.error(f"Token exchange failed: {str(e)}")
         return None
 
-def get_user_info(access_token):
-    """Get user information from Google"""
+def get_user_info(id_token):
+    """Get user information from the ID token, verified locally against Google's cached signing keys"""
     try:
-        headers = {'Authorization': f'Bearer {access_token}'}
-        response = requests.get('https://www.googleapis.com/oauth2/v2/userinfo', headers=headers)
-        return response.json()
+        from id_tokens import user_info_from_claims, verify_id_token
+
+        return user_info_from_claims(verify_id_token(id_token, GOOGLE_CLIENT_ID))
     except Exception as e:
-        st.error(f"Failed to get user info: {str(e)}")
+        st.error(f"Failed to verify sign-in: {str(e)}")
+        return None
+
+@st.cache_resource
+def get_login_sessions():
+    """Process-wide store of signed login sessions, so reloads skip the OAuth handshake
+
+    None while SECRET_KEY is unset: tokens signed with the public placeholder could be forged.
+    """
+    if not Config.has_secret_key():
         return None
+    return SessionStore(Config.SESSION_DB_PATH, Config.SECRET_KEY, ttl=Config.SESSION_TTL_HOURS * 3600)
+
+def set_session_cookie(token, max_age):
+    """Store the session token in a first-party cookie on the app's page (max_age 0 deletes it)
+
+    Streamlit can only read cookies (st.context.cookies), so a script in a
+    contentless iframe writes it; a cookie set from a script can't be HttpOnly.
+    The iframe is only rendered when the value changes, not on every rerun.
+    """
+    if st.session_state.get('session_cookie_written') == token:
+        return
+    cookie = f"{SESSION_COOKIE}={token}; Path=/; Max-Age={int(max_age)}; SameSite=Strict"
+    if (st.context.url or "").startswith("https://"):
+        cookie += "; Secure"
+    st.iframe(f"<script>window.parent.document.cookie = {json.dumps(cookie)};</script>", height="content")
+    st.session_state.session_cookie_written = token
 
 def login_page():
     """Display login page"""
@@ -101,6 +117,9 @@ def login_page():
         """, unsafe_allow_html=True)
         
         if GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET:
+            if not Config.has_secret_key():
+                st.warning("⚠️ SECRET_KEY is not set, so sign-ins won't survive a page reload. "
+                           "Set SECRET_KEY in your .env file to enable saved sessions.")
             auth_url = generate_auth_url()
             if auth_url:
                 st.markdown(f"""
@@ -157,25 +176,45 @@ if 'authenticated' not in st.session_state:
 if 'user_info' not in st.session_state:
     st.session_state.user_info = None
 
-# Check for OAuth callback
+# Messages queued by the action that triggered this rerun
+show_flashed()
+
+# Resume the signed session in the browser's cookie (page reload) without going back to Google
+session_cookie = st.context.cookies.get(SESSION_COOKIE)
+if st.session_state.pop('delete_session_cookie', False):
+    set_session_cookie("", 0)
+elif session_cookie and not st.session_state.authenticated:
+    login_sessions = get_login_sessions()
+    session = login_sessions.resume(session_cookie) if login_sessions else None
+    if session:
+        st.session_state.authenticated = True
+        st.session_state.user_info = session['user_info']
+        st.session_state.session_token = session_cookie
+    else:
+        # Expired, revoked (logout) or forged
+        set_session_cookie("", 0)
+
 query_params = st.query_params
+
+# Check for OAuth callback
 if 'code' in query_params and not st.session_state.authenticated:
     with st.spinner("🔐 Authenticating with Google..."):
         auth_code = query_params['code']
         token_response = exchange_code_for_token(auth_code)
         
-        if token_response and 'access_token' in token_response:
-            user_info = get_user_info(token_response['access_token'])
+        if token_response and 'id_token' in token_response:
+            user_info = get_user_info(token_response['id_token'])
             if user_info:
                 st.session_state.authenticated = True
                 st.session_state.user_info = user_info
                 st.session_state.access_token = token_response['access_token']
                 
-                # Clear the URL parameters
+                # Drop the OAuth parameters; the session token goes in a cookie once the dashboard renders
                 st.query_params.clear()
-                st.success("✅ Authentication successful!")
-                time.sleep(1)
-                st.rerun()
+                login_sessions = get_login_sessions()
+                if login_sessions:
+                    st.session_state.session_token, _ = login_sessions.create(user_info)
+                flash_and_rerun("Authentication successful!")
             else:
                 st.error("❌ Failed to get user information")
         else:
@@ -186,6 +225,28 @@ if not st.session_state.authenticated:
     login_page()
     st.stop()
 
+# The cookie seen here is from when the page loaded, so write it until the next reload picks it up
+if st.session_state.get('session_token') and session_cookie != st.session_state.session_token:
+    set_session_cookie(st.session_state.session_token, get_login_sessions().ttl)
+
+# ----------------------------- DASHBOARD MODULES -----------------------------
+# Imported past the login gate, so the sign-in page renders without pandas, numpy or the data
+# modules; yfinance, groq, plotly and xlsxwriter are only imported where they are used
+import numpy as np
+import pandas as pd
+from scoring import USD_TO_INR, REVENUE_RATE, score_batch
+from ingest import FORM_BOUNDS, SPENDING_CATEGORIES, stream_scored_chunks
+from portfolio import Portfolio
+from portfolio_store import StoredAnalyses, get_store
+from market import MarketDataService
+from cache import CacheRegistry
+from analysis import AnalysisQueue, build_analysis_prompt, plan_batches, stream_analysis, wait_for
+from analysis_cache import AnalysisCache
+from exports import EXPORT_FORMATS, discard_export, read_export
+from charts import opportunity_figure, revenue_projection_figure, scenario_heatmap, utilization_figure
+from scenarios import run_scenarios, scenario_grid
+from simulation import bucket_portfolio, simulate_revenue
+
 # ----------------------------- STYLES -----------------------------
 st.markdown("""
 <style>
@@ -245,7 +306,6 @@ st.markdown("""
         margin: 1.5rem 0;
     }
     .real-data-badge { background:#28a745;color:white;padding:0.2rem 0.5rem;border-radius:5px;font-size:0.7rem;margin-left:0.5rem; }
-    .success-box { background:#d4edda;border:1px solid #c3e6cb;color:#155724;padding:1rem;border-radius:8px;margin:1rem 0; }
     .user-info {
         background: white;
         padding: 1rem;
@@ -284,67 +344,119 @@ if st.session_state.user_info:
     
     with col_logout:
         if st.button("🚪 Logout", type="secondary", use_container_width=True):
-            # Clear session state
+            # Revoke the stored session, clear session state and have the login page delete the cookie
+            if st.session_state.get('session_token'):
+                get_login_sessions().revoke(st.session_state.session_token)
+            st.query_params.clear()
             for key in list(st.session_state.keys()):
                 del st.session_state[key]
+            st.session_state.delete_session_cookie = True
             st.rerun()
 
 # ------------------------ GROQ CLIENT ------------------------
 @st.cache_resource
 def init_groq_client():
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        st.error("⚠ Please set your GROQ_API_KEY in the .env file")
-        st.stop()
-    return Groq(api_key=api_key)
+    """Groq client, created (and groq imported) the first time an analysis is requested"""
+    from groq import Groq
+
+    return Groq(api_key=os.getenv("GROQ_API_KEY"))
+
+if not os.getenv("GROQ_API_KEY"):
+    st.error("⚠ Please set your GROQ_API_KEY in the .env file")
+    st.stop()
+
+@st.cache_resource
+def get_analysis_queue():
+    """Process-wide concurrent analysis queue (bounded concurrency, retry with backoff, persistent cache)"""
+    cache = AnalysisCache(Config.ANALYSIS_CACHE_PATH, ttl=Config.ANALYSIS_CACHE_TTL,
+                          max_entries=Config.ANALYSIS_CACHE_MAX_ENTRIES)
+    return AnalysisQueue(os.getenv("GROQ_API_KEY"), concurrency=Config.ANALYSIS_CONCURRENCY, cache=cache)
 
-client = init_groq_client()
+# ------------------------ CACHES ------------------------
+@st.cache_resource
+def get_caches():
+    """Process-wide cache namespaces (scoring, exports, queries, charts), invalidated independently"""
+    caches = CacheRegistry()
+    caches["exports"].on_evict = discard_export
+    return caches
 
 # ------------------------ MARKET DATA ------------------------
-@st.cache_data(ttl=300)
-def get_real_market_data():
-    try:
-        sp500 = yf.Ticker("^GSPC")
-        vix = yf.Ticker("^VIX")
-        treasury = yf.Ticker("^TNX")
+@st.cache_resource
+def get_market_service():
+    """Process-wide market data service (concurrent fetch, stale-while-revalidate)"""
+    return MarketDataService.from_config()
 
-        sp500_data = sp500.history(period="2d")
-        vix_data = vix.history(period="1d")
-        treasury_data = treasury.history(period="1d")
+# ------------------------ PORTFOLIO ------------------------
+@st.cache_resource
+def get_portfolio_store():
+    """Process-wide connection pool to the shared portfolio database"""
+    return get_store(Config.PORTFOLIO_STORE, path=Config.PORTFOLIO_DB_PATH, pool_size=Config.PORTFOLIO_DB_POOL_SIZE)
 
-        if len(sp500_data) >= 2:
-            sp500_change = ((sp500_data['Close'].iloc[-1] - sp500_data['Close'].iloc[-2]) / sp500_data['Close'].iloc[-2]) * 100
-        else:
-            sp500_change = random.uniform(-2, 2)
-
-        return {
-            'sp500_change': sp500_change,
-            'vix_level': vix_data['Close'].iloc[-1] if not vix_data.empty else random.uniform(12, 35),
-            'treasury_rate': treasury_data['Close'].iloc[-1] if not treasury_data.empty else random.uniform(4.2, 5.8),
-            'timestamp': datetime.now(),
-            'data_source': 'live' if not sp500_data.empty else 'simulated'
-        }
-    except Exception as e:
-        return {
-            'sp500_change': random.uniform(-2, 2),
-            'vix_level': random.uniform(12, 35),
-            'treasury_rate': random.uniform(4.2, 5.8),
-            'timestamp': datetime.now(),
-            'data_source': 'simulated',
-            'error': str(e)
-        }
+@st.cache_resource
+def get_portfolio():
+    """The shared customer book, loaded once per process and kept in step with the store"""
+    return Portfolio(store=get_portfolio_store())
+
+@st.cache_resource
+def get_analysis_results():
+    """Shared AI analyses by customer ID, persisted alongside the portfolio"""
+    return StoredAnalyses(get_portfolio_store())
+
+def analysis_html(customer_name, analysis):
+    """AI Strategic Analysis panel markup"""
+    return f"""
+    <div class="analysis-container">
+        <h4>🧠 AI Strategic Analysis - {customer_name}</h4>
+        <div style="white-space: pre-wrap; line-height: 1.5; font-size: 0.9rem;">
+{analysis}
+        </div>
+    </div>
+    """
 
 # --------------------- SESSION DEFAULTS ---------------------
-if 'customers' not in st.session_state:
-    st.session_state.customers = []
-if 'processed_customers' not in st.session_state:
-    st.session_state.processed_customers = 0
-if 'total_revenue_impact' not in st.session_state:
-    st.session_state.total_revenue_impact = 0.0
-if 'analysis_results' not in st.session_state:
-    st.session_state.analysis_results = {}
 if 'show_analysis' not in st.session_state:
     st.session_state.show_analysis = {}
+if 'rescore_changes' not in st.session_state:
+    st.session_state.rescore_changes = None
+if 'confirm_clear' not in st.session_state:
+    st.session_state.confirm_clear = False
+if 'confirm_approve_all' not in st.session_state:
+    st.session_state.confirm_approve_all = None
+
+# Shared by every analyst; pick up anything other processes have written since the last run
+portfolio = get_portfolio()
+portfolio.sync()
+analysis_results = get_analysis_results()
+analysis_results.sync()
+
+
+def portfolio_cached(namespace, name, factory):
+    """Value derived from the portfolio, cached until the portfolio next changes"""
+    return get_caches()[namespace].get_or_set((portfolio.uid, portfolio.version, name), factory)
+
+
+def analyzed_ids():
+    """IDs of customers in the book with an AI analysis, cached until either changes"""
+    return portfolio_cached("queries", ("analyzed", analysis_results.version),
+                            lambda: [cid for cid in analysis_results if cid in portfolio])
+
+
+def pending_analysis_ids(count, chunk=1000):
+    """Up to ``count`` IDs of customers without an analysis, most recently added first"""
+    ids = portfolio.frame["id"]
+    pending = []
+    for end in range(len(ids), 0, -chunk):
+        pending.extend(cid for cid in reversed(ids.iloc[max(0, end - chunk):end].tolist())
+                       if cid not in analysis_results)
+        if len(pending) >= count:
+            break
+    return pending[:count]
+
+
+def invalidate_portfolio_caches():
+    """Drop scoring results, exports, table queries and charts for this portfolio only"""
+    for namespace in ("scoring", "exports", "queries", "charts"):
+        get_caches().invalidate(namespace, prefix=(portfolio.uid,))
 
 # ----------------------------- HEADER -----------------------------
 st.markdown(f"""
@@ -362,7 +474,7 @@ tab_dashboard, tab_all = st.tabs(["📊 Dashboard", "📋 All Customers"])
 # ============================== DASHBOARD ==============================
 with tab_dashboard:
     # --- Market cards ---
-    market_data = get_real_market_data()
+    market_data = get_market_service().get()
     c1, c2, c3, c4 = st.columns(4)
     with c1:
         color = "🟢" if market_data['sp500_change'] > 0 else "🔴"
@@ -387,56 +499,76 @@ with tab_dashboard:
         col1, col2 = st.columns(2)
         with col1:
             customer_name = st.text_input("Customer Name *", placeholder="e.g., John Smith")
-            current_limit = st.number_input("Current Credit Limit (₹) *", min_value=500, max_value=100000, value=5000, step=500)
-            utilization = st.slider("Credit Utilization (%)", 0, 100, 45)
-            payment_history = st.slider("Payment History Score", 0, 100, 85)
+            current_limit = st.number_input("Current Credit Limit (₹) *", *FORM_BOUNDS["current_limit"], value=5000, step=500)
+            utilization = st.slider("Credit Utilization (%)", *FORM_BOUNDS["utilization"], 45)
+            payment_history = st.slider("Payment History Score", *FORM_BOUNDS["payment_history"], 85)
         with col2:
-            income = st.number_input("Annual Income (₹) *", min_value=25000, max_value=500000, value=65000, step=5000)
-            risk_score = st.number_input("Risk Score (300-850)", min_value=300, max_value=850, value=650)
-            months_since_increase = st.number_input("Months Since Last Increase", min_value=0, max_value=120, value=12)
-            spending_category = st.selectbox("Primary Spending Category",
-                                             ["Groceries", "Gas", "Dining", "Travel", "Shopping", "Healthcare", "Business"])
+            income = st.number_input("Annual Income (₹) *", *FORM_BOUNDS["income"], value=65000, step=5000)
+            risk_score = st.number_input("Risk Score (300-850)", *FORM_BOUNDS["risk_score"], value=650)
+            months_since_increase = st.number_input("Months Since Last Increase", *FORM_BOUNDS["months_since_increase"], value=12)
+            spending_category = st.selectbox("Primary Spending Category", SPENDING_CATEGORIES)
         submitted = st.form_submit_button("➕ Add Customer for Analysis", type="primary", use_container_width=True)
 
+    # --- Bulk import ---
+    with st.expander("📂 Bulk Import Portfolio (CSV / Parquet)"):
+        st.markdown("Columns: `name`, `current_limit`, `income` (required) and optionally `utilization`, "
+                    "`payment_history`, `risk_score`, `months_since_increase`, `spending_category`. "
+                    "Values use the same units and bounds as the form above.")
+        uploaded = st.file_uploader("Portfolio file", type=["csv", "parquet"], key="bulk_upload")
+        if uploaded is not None and st.button("⬆ Import & Score", type="primary"):
+            report = {}
+            progress = st.empty()
+            try:
+                for chunk in stream_scored_chunks(uploaded, market_data,
+                                                  st.session_state.user_info.get('email', 'unknown'),
+                                                  existing_names=set(portfolio.normalized_names()),
+                                                  allocate_ids=portfolio.allocate_ids,
+                                                  report=report):
+                    portfolio.append(chunk)
+                    invalidate_portfolio_caches()
+                    progress.info(f"⏳ {report['accepted']:,} customers scored so far...")
+                progress.success(f"✅ Imported {report['accepted']:,} of {report['read']:,} rows "
+                                 f"({report['rejected']:,} rejected)")
+            except ValueError as e:
+                progress.error(f"❌ Import failed: {str(e)}")
+            if report.get("rejected_sample"):
+                st.dataframe(pd.DataFrame(report["rejected_sample"]), use_container_width=True)
+
     # --- Submission handling ---
     if submitted:
         if not customer_name or not customer_name.strip():
             st.error("❌ Customer name is required!")
-        elif customer_name.strip() in [c['name'] for c in st.session_state.customers]:
+        elif portfolio.has_name(customer_name.strip()):
             st.error("❌ Customer with this name already exists in portfolio!")
         else:
             utilization_decimal = utilization / 100
-            utilization_factor = max(0.5, 1 - utilization_decimal) if utilization_decimal > 0.7 else 1.2
-            income_factor = min(2.0, income / 50000)
-            risk_factor = max(0.3, (risk_score - 300) / 550)
-            time_factor = min(1.3, 1 + (months_since_increase / 60))
-
-            market_factor = 1.0
-            if market_data['sp500_change'] > 1: market_factor = 1.1
-            elif market_data['sp500_change'] < -1: market_factor = 0.9
 
             # Convert current_limit and income to INR
             current_limit_inr = int(current_limit * USD_TO_INR)
             income_inr = int(income * USD_TO_INR)
 
-            # Use INR for recommended_limit calculation
-            recommended_limit_inr = int(current_limit_inr * utilization_factor * income_factor * risk_factor * time_factor * market_factor)
-            recommended_limit_inr = max(current_limit_inr, recommended_limit_inr)
-            rate_reduction = max(0, (payment_history - 80) * 0.05 + (risk_score - 600) * 0.01);
-
-            increase_percentage = (recommended_limit_inr - current_limit_inr) / current_limit_inr
-            opportunity = "High" if increase_percentage > 0.3 else ("Medium" if increase_percentage > 0.1 else "Low")
+            scored = score_batch(pd.DataFrame([{
+                "current_limit": current_limit_inr,
+                "utilization": utilization_decimal,
+                "payment_history": payment_history,
+                "income": income_inr,
+                "risk_score": risk_score,
+                "months_since_increase": months_since_increase,
+            }]), market_data).iloc[0]
+            recommended_limit_inr = int(scored["recommended_limit"])
+            rate_reduction = float(scored["rate_reduction"])
+            increase_percentage = float(scored["increase_percentage"])
+            opportunity = scored["opportunity"]
 
             new_customer = {
-                "id": f"C{len(st.session_state.customers) + 1:03d}",
+                "id": portfolio.next_id(),
                 "name": customer_name.strip(),
                 "current_limit": current_limit_inr,
                 "utilization": utilization_decimal,
                 "payment_history": payment_history,
                 "income": income_inr,
                 "risk_score": risk_score,
-                "last_increase": f"{months_since_increase} months ago" if months_since_increase > 0 else "never",
-                "spending_trend": "analyzed",
+                "months_since_increase": months_since_increase,
                 "category_spend": {spending_category.lower(): int(current_limit_inr * utilization_decimal * 0.6)},
                 "opportunity": opportunity,
                 "recommended_limit": recommended_limit_inr,
@@ -446,30 +578,28 @@ with tab_dashboard:
                 "spending_category": spending_category,
                 "added_by": st.session_state.user_info.get('email', 'unknown')  # Track who added
             }
-            st.session_state.customers.append(new_customer)
-
-            st.markdown(f"""
-            <div class="success-box">
-                <h4>✅ {customer_name.strip()} Added Successfully!</h4>
-                <ul>
-                    <li><strong>AI Recommendation:</strong> ₹{recommended_limit_inr:,} limit ({increase_percentage * 100:.0f}% increase)</li>
-                    <li><strong>Opportunity Level:</strong> {opportunity}</li>
-                    <li><strong>Potential APR Reduction:</strong> {rate_reduction:.1f}%</li>
-                    <li><strong>Revenue Impact:</strong> ₹{(recommended_limit_inr - current_limit_inr) * 0.15:,.0f} annually</li>
-                    <li><strong>Market Timing:</strong> {'Favorable' if market_data['sp500_change'] > 0 else 'Cautious approach'}</li>
-                </ul>
-            </div>
-            """, unsafe_allow_html=True)
-            time.sleep(1); st.rerun()
+            try:
+                # Another analyst may have added the same name since the check above
+                portfolio.append([new_customer])
+            except ValueError as e:
+                st.error(f"❌ Could not add customer: {str(e)}")
+            else:
+                invalidate_portfolio_caches()
+                flash_and_rerun(
+                    f"**{customer_name.strip()} added successfully!**  \n"
+                    f"AI Recommendation: ₹{recommended_limit_inr:,} limit ({increase_percentage * 100:.0f}% increase) • "
+                    f"{opportunity} opportunity • APR reduction {rate_reduction:.1f}% • "
+                    f"Revenue impact ₹{(recommended_limit_inr - current_limit_inr) * REVENUE_RATE:,.0f}/yr • "
+                    f"Market timing: {'Favorable' if market_data['sp500_change'] > 0 else 'Cautious approach'}")
 
     # --- Display last 3 customers + metrics/charts ---
-    if st.session_state.customers:
+    if len(portfolio):
         st.markdown("### Customer Portfolio Analysis")
-        st.markdown(f"*Showing {min(3, len(st.session_state.customers))} most recent customers:*")
+        st.markdown(f"*Showing {min(3, len(portfolio))} most recent customers:*")
         left, right = st.columns([2, 1])
 
         with left:
-            for i, customer in enumerate(reversed(st.session_state.customers[-3:])):
+            for i, customer in enumerate(reversed(portfolio.tail(3))):
                 opportunity_class = f"opportunity-{customer['opportunity'].lower()}"
                 st.markdown(f"""
                 <div class="customer-card {opportunity_class}">
@@ -486,7 +616,7 @@ with tab_dashboard:
                         <strong>🧠 AI Recommendation:</strong><br>
                         • Increase limit to ₹{customer['recommended_limit']:,} (+{((customer['recommended_limit'] / customer['current_limit']) - 1) * 100:.0f}%)<br>
                         • Potential APR reduction: {customer['rate_reduction']:.1f}%<br>
-                        • Estimated annual revenue increase: ₹{(customer['recommended_limit'] - customer['current_limit']) * 0.15:,.0f}<br>
+                        • Estimated annual revenue increase: ₹{(customer['recommended_limit'] - customer['current_limit']) * REVENUE_RATE:,.0f}<br>
                         • Market timing: {"Favorable conditions" if market_data['sp500_change'] > 0 else "Cautious approach recommended"}
                     </div>
                 </div>
@@ -497,78 +627,57 @@ with tab_dashboard:
                 customer_key = customer['id']
 
                 with col_a:
-                    if st.button("✅ Approve", key=f"approve_{customer_key}_{i}_main"):
-                        st.session_state.processed_customers += 1
-                        revenue_impact = (customer['recommended_limit'] - customer['current_limit']) * 0.15
-                        st.session_state.total_revenue_impact += revenue_impact
-                        st.success(f"✅ Changes approved for {customer['name']}! Revenue impact: ₹{revenue_impact:,.0f}")
-                        time.sleep(1)
-                        st.rerun()
+                    if portfolio.is_approved(customer_key):
+                        st.markdown("✅ *Approved*")
+                    elif st.button("✅ Approve", key=f"approve_{customer_key}_{i}_main"):
+                        revenue_impact = (customer['recommended_limit'] - customer['current_limit']) * REVENUE_RATE
+                        if portfolio.approve(customer_key, st.session_state.user_info.get('email', 'unknown')):
+                            flash_and_rerun(f"Changes approved for {customer['name']}! "
+                                            f"Revenue impact: ₹{revenue_impact:,.0f}")
+                        else:
+                            flash_and_rerun(f"{customer['name']} was already approved", "info")
 
                 with col_b:
                     if st.button("📧 Send Offer", key=f"offer_{customer_key}_{i}_main"):
                         st.info(f"📧 Personalized offer sent to {customer['name']}")
 
                 with col_c:
-                    if st.button("📊 AI Analysis", key=f"analyze_{customer_key}_{i}_main"):
-                        with st.spinner("🧠 AI analyzing customer profile..."):
-                            analysis_prompt = f"""
-                            As a senior Synchrony credit analyst, provide strategic recommendations for this customer:
-
-                            Customer Profile:
-                            • Name: {customer['name']}
-                            • Current Limit: ₹{customer['current_limit']:,}
-                            • Utilization: {customer['utilization']:.0%}
-                            • Income: ₹{customer['income']:,}
-                            • Risk Score: {customer['risk_score']}
-                            • Payment History: {customer['payment_history']}%
-                            • Primary Spending: {customer.get('spending_category', 'Mixed')}
-                            • Market Context: {customer['market_context']}
-                            • Current Market: S&P {market_data['sp500_change']:+.1f}%, VIX {market_data['vix_level']:.1f}
-
-                            Provide analysis in these 4 sections (2-3 lines each):
-
-                            1. RISK ASSESSMENT:
-                            2. REVENUE OPPORTUNITY:
-                            3. MARKET TIMING:
-                            4. STRATEGIC RECOMMENDATION:
-
-                            Keep response concise and actionable.
-                            """
-
-                            try:
-                                response = client.chat.completions.create(
-                                    model="llama-3.3-70b-versatile",
-                                    messages=[{"role": "user", "content": analysis_prompt}],
-                                    max_tokens=350,
-                                    temperature=0.7
-                                )
-                                analysis = response.choices[0].message.content
-                                st.session_state.analysis_results[customer_key] = analysis
-                                st.session_state.show_analysis[customer_key] = True
-                            except Exception as e:
-                                st.error(f"Analysis error: {str(e)}")
+                    analyze_clicked = st.button("📊 AI Analysis", key=f"analyze_{customer_key}_{i}_main")
+
+                # Stream the analysis into its container as tokens arrive
+                if analyze_clicked:
+                    analysis_slot = st.empty()
+                    analysis_slot.markdown(analysis_html(customer['name'], "🧠 AI analyzing customer profile..."),
+                                           unsafe_allow_html=True)
+                    analysis_prompt = build_analysis_prompt(customer, market_data)
+                    analysis = ""
+                    try:
+                        for token in stream_analysis(init_groq_client(), analysis_prompt, cache=get_analysis_queue().cache):
+                            analysis += token
+                            analysis_slot.markdown(analysis_html(customer['name'], analysis + "▌"),
+                                                   unsafe_allow_html=True)
+                        analysis_results[customer_key] = analysis
+                        st.session_state.show_analysis[customer_key] = True
+                    except Exception as e:
+                        st.error(f"Analysis error: {str(e)}")
+                    analysis_slot.empty()
 
                 # Display analysis in properly formatted container
-                if st.session_state.show_analysis.get(customer_key, False):
-                    st.markdown(f"""
-                    <div class="analysis-container">
-                        <h4>🧠 AI Strategic Analysis - {customer['name']}</h4>
-                        <div style="white-space: pre-wrap; line-height: 1.5; font-size: 0.9rem;">
-{st.session_state.analysis_results[customer_key]}
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
+                if st.session_state.show_analysis.get(customer_key, False) and \
+                        customer_key in analysis_results:
+                    st.markdown(analysis_html(customer['name'], analysis_results[customer_key]),
+                                unsafe_allow_html=True)
                     if st.button(f"🟥 ✕ Close Analysis", key=f"close_{customer_key}_{i}"):
                         st.session_state.show_analysis[customer_key] = False
                         st.rerun()
 
         with right:
             st.markdown("### 📊 Real-Time Portfolio Metrics")
-            total_customers = len(st.session_state.customers)
-            total_portfolio_value = sum([c['current_limit'] for c in st.session_state.customers])
-            avg_utilization = sum([c['utilization'] for c in st.session_state.customers]) / max(total_customers, 1)
-            high_opportunity_count = len([c for c in st.session_state.customers if c['opportunity'] == 'High'])
+            stats = portfolio.stats
+            total_customers = stats.count
+            total_portfolio_value = stats.total_limit
+            avg_utilization = stats.avg_utilization
+            high_opportunity_count = stats.opportunity_counts['High']
 
             st.markdown(f"""
             <div class="metric-card">
@@ -577,105 +686,255 @@ with tab_dashboard:
                 <div><strong>Portfolio Value:</strong> ₹{total_portfolio_value:,}</div>
                 <div><strong>Avg Utilization:</strong> {avg_utilization:.0%}</div>
                 <div><strong>High Opportunities:</strong> {high_opportunity_count}</div>
+                <div><strong>Approved:</strong> {stats.approved_count} (₹{stats.approved_revenue:,.0f}/yr)</div>
                 <div><strong>Analyst:</strong> {st.session_state.user_info.get('name', 'Unknown')}</div>
             </div>
             """, unsafe_allow_html=True)
 
             if total_customers > 0:
                 st.markdown("#### Customer Utilization Distribution")
-                fig = px.histogram(x=[c['utilization'] * 100 for c in st.session_state.customers],
-                                   nbins=min(10, total_customers),
-                                   title="Credit Utilization (%)",
-                                   labels={'x': 'Utilization %', 'y': 'Customers'})
-                fig.update_layout(height=250, showlegend=False,
-                                  xaxis_title="Utilization %", yaxis_title="Customers")
+                fig = portfolio_cached("charts", "utilization",
+                                       lambda: utilization_figure(stats.utilization_bins))
                 st.plotly_chart(fig, use_container_width=True)
 
                 st.markdown("#### Opportunity Distribution")
-                counts = {}
-                for c in st.session_state.customers:
-                    counts[c['opportunity']] = counts.get(c['opportunity'], 0) + 1
-                fig_pie = px.pie(values=list(counts.values()), names=list(counts.keys()),
-                                 color_discrete_map={'High': '#28a745', 'Medium': '#ffc107', 'Low': '#dc3545'})
-                fig_pie.update_layout(height=250)
+                fig_pie = portfolio_cached("charts", "opportunity",
+                                           lambda: opportunity_figure(stats.opportunity_counts))
                 st.plotly_chart(fig_pie, use_container_width=True)
 
         # --- Refresh controls ---
         r1, r2, r3 = st.columns(3)
         with r1:
             if st.button("🔄 Refresh Market Data", type="secondary"):
-                st.cache_data.clear(); st.rerun()
+                # Wait briefly for the fetch; if it's slow, it keeps running and lands on a later rerun
+                service = get_market_service()
+                try:
+                    service.refresh().result(timeout=service.cold_start_timeout)
+                    message, kind = "Market data refreshed.", "success"
+                except TimeoutError:
+                    message, kind = "Market data is still loading; figures update once it arrives.", "info"
+                flash_and_rerun(message, kind)
         with r2:
             if st.button("📊 Recalculate All", type="secondary"):
-                for cust in st.session_state.customers:
-                    cust['market_context'] = f"Updated during {market_data['sp500_change']:+.1f}% market day"
-                st.success("✅ All customer data recalculated with current market conditions!")
-                time.sleep(1); st.rerun()
+                changes = portfolio.rescore(market_data,
+                                            f"Updated during {market_data['sp500_change']:+.1f}% market day")
+                invalidate_portfolio_caches()
+                st.session_state.rescore_changes = changes
+                flash_and_rerun(f"All customer data recalculated with current market conditions! "
+                                f"{len(changes):,} opportunity changes.")
         with r3:
-            if st.button("🗑 Clear Portfolio", type="secondary"):
-                st.session_state.customers = []
-                st.session_state.processed_customers = 0
-                st.session_state.total_revenue_impact = 0.0
-                st.session_state.analysis_results = {}
-                st.session_state.show_analysis = {}
-                st.success("✅ Portfolio cleared!")
-                time.sleep(1); st.rerun()
+            # The book is shared by every analyst, so clearing it is admin-only and needs confirming
+            is_admin = st.session_state.user_info.get('email', '') in Config.ADMIN_EMAILS
+            if st.button("🗑 Clear Portfolio", type="secondary", disabled=not is_admin,
+                         help=None if is_admin else "Only admins (ADMIN_EMAILS) can clear the shared portfolio"):
+                st.session_state.confirm_clear = True
+            if is_admin and st.session_state.confirm_clear:
+                st.warning(f"This deletes all {len(portfolio):,} customers and their AI analyses "
+                           "for every analyst. The approval ledger is kept.")
+                c_yes, c_no = st.columns(2)
+                if c_yes.button("Delete everything", type="primary"):
+                    st.session_state.confirm_clear = False
+                    invalidate_portfolio_caches()
+                    portfolio.clear()
+                    analysis_results.clear()
+                    st.session_state.show_analysis = {}
+                    st.session_state.rescore_changes = None
+                    flash_and_rerun("Portfolio cleared!")
+                if c_no.button("Cancel"):
+                    st.session_state.confirm_clear = False
+                    st.rerun()
+
+        changes = st.session_state.rescore_changes
+        if changes is not None:
+            with st.expander(f"📋 Opportunity changes from last recalculation ({len(changes):,})"):
+                if len(changes):
+                    st.dataframe(changes, hide_index=True, use_container_width=True)
+                else:
+                    st.markdown("*No customer changed opportunity tier.*")
+
+        # --- Scenario stress test ---
+        with st.expander("🧪 Market Stress Test"):
+            s1, s2, s3, s4 = st.columns(4)
+            with s1:
+                sp500_range = st.slider("S&P 500 change (%)", -10.0, 10.0, (-5.0, 5.0), 0.5)
+            with s2:
+                vix_range = st.slider("VIX level", 10.0, 80.0, (12.0, 45.0), 1.0)
+            with s3:
+                rate_range = st.slider("Rate move (pp)", -3.0, 3.0, (-1.0, 1.0), 0.25)
+            with s4:
+                steps = st.number_input("Steps per factor", min_value=2, max_value=25, value=10)
+            if total_customers == 0:
+                st.markdown("*Add customers to run a stress test.*")
+            elif st.toggle("Run stress test", key="run_stress_test"):
+                grid_params = (sp500_range, vix_range, rate_range, int(steps))
+                try:
+                    results = portfolio_cached("scoring", ("scenarios", grid_params), lambda: run_scenarios(
+                        portfolio.frame, scenario_grid(np.linspace(*sp500_range, int(steps)),
+                                                       np.linspace(*vix_range, int(steps)),
+                                                       np.linspace(*rate_range, int(steps)))))
+                except ValueError as e:
+                    st.error(f"❌ Could not run the stress test: {str(e)}")
+                else:
+                    worst = results.loc[results["revenue_impact"].idxmin()]
+                    st.markdown(f"*{len(results):,} scenarios • revenue impact "
+                                f"₹{results['revenue_impact'].min():,.0f} to ₹{results['revenue_impact'].max():,.0f} "
+                                f"• worst case: S&P {worst['sp500_change']:+.1f}%, VIX {worst['vix_level']:.1f}, "
+                                f"rates {worst['rate_change']:+.2f}pp*")
+                    st.plotly_chart(portfolio_cached("charts", ("scenarios", grid_params),
+                                                     lambda: scenario_heatmap(results)), use_container_width=True)
+                    st.dataframe(results, hide_index=True, use_container_width=True)
+
+        # --- Portfolio-wide AI analysis ---
+        with st.expander("🧠 Portfolio AI Analysis"):
+            analyzed_count = len(analyzed_ids())
+            pending_count = len(portfolio) - analyzed_count
+            cache_stats = get_analysis_queue().cache.stats()
+            st.markdown(f"*{analyzed_count:,} analyzed • {pending_count:,} pending • "
+                        f"cache: {cache_stats['entries']:,} entries, {cache_stats['hits']:,} hits / "
+                        f"{cache_stats['misses']:,} misses*")
+            analyze_count = st.number_input("Customers to analyze (most recent first)", min_value=1,
+                                            max_value=max(1, pending_count), value=min(50, max(1, pending_count)))
+            batched = st.radio("Mode", ["Per customer", "Batched portfolio"], horizontal=True,
+                               help="Batched mode packs many customers into each request with one shared preamble") \
+                == "Batched portfolio"
+            if pending_count and st.button("🧠 Analyze Pending Customers", type="primary"):
+                batch_ids = pending_analysis_ids(analyze_count)
+                if batched:
+                    batches = plan_batches(portfolio.records_by_id(batch_ids), market_data)
+                    futures = get_analysis_queue().submit_batches(batches, analysis_results)
+                    unit = "batches"
+                else:
+                    prompts = {cid: build_analysis_prompt(portfolio.get(cid), market_data) for cid in batch_ids}
+                    futures = get_analysis_queue().submit_many(prompts, analysis_results)
+                    unit = "analyses"
+                progress = st.progress(0.0, text="🧠 AI analyzing customer profiles...")
+                completed = []
+
+                def on_done(key, error):
+                    completed.append(key)
+                    progress.progress(len(completed) / len(futures),
+                                      text=f"🧠 {len(completed)}/{len(futures)} {unit} complete")
+
+                errors = wait_for(futures, on_done)
+                if errors:
+                    st.error(f"Analysis error for {len(errors)} request(s): {str(next(iter(errors.values())))}")
+                done_count = sum(1 for cid in batch_ids if cid in analysis_results)
+                st.success(f"✅ {done_count} of {len(batch_ids)} customer analyses complete"
+                           + (f" in {len(futures)} batched requests" if batched else ""))
 
         # --- Revenue projection ---
-        st.markdown("#### 💰 6-Month Revenue Projection")
-        months = ['Month 1', 'Month 2', 'Month 3', 'Month 4', 'Month 5', 'Month 6']
-        baseline = [st.session_state.total_revenue_impact * (i + 1) / 6 for i in range(6)]
-        optimized = [st.session_state.total_revenue_impact * 1.2 * (i + 1) / 6 for i in range(6)]
-        fig_rev = go.Figure()
-        fig_rev.add_trace(go.Scatter(x=months, y=baseline, name='Conservative Estimate'))
-        fig_rev.add_trace(go.Scatter(x=months, y=optimized, name='Optimistic Projection'))
-        fig_rev.update_layout(title="Revenue Impact Projection (₹)", height=400,
-                              xaxis_title="Timeline", yaxis_title="Revenue Impact (₹)")
+        st.markdown("#### 💰 Revenue Projection (Monte Carlo)")
+        p1, p2, p3 = st.columns(3)
+        with p1:
+            horizon = st.slider("Horizon (months)", 1, 24, 6)
+        with p2:
+            paths = st.select_slider("Simulated paths", options=[1000, 2000, 5000, 10000, 20000, 50000], value=10000)
+        with p3:
+            seed = st.number_input("Seed", min_value=0, value=42, step=1)
+        projection = (horizon, paths, int(seed))
+        bands, per_bucket = portfolio_cached("scoring", ("projection", projection), lambda: simulate_revenue(
+            bucket_portfolio(portfolio.frame), horizon=horizon, paths=paths, seed=int(seed),
+            workers=Config.SIMULATION_WORKERS))
+        fig_rev = portfolio_cached("charts", ("projection", projection), lambda: revenue_projection_figure(bands))
         st.plotly_chart(fig_rev, use_container_width=True)
+        st.markdown(f"*Cumulative revenue after {horizon} months if all recommendations are applied: median "
+                    f"₹{bands['p50'].iloc[-1]:,.0f} (90% band ₹{bands['p5'].iloc[-1]:,.0f} – "
+                    f"₹{bands['p95'].iloc[-1]:,.0f}) over {paths:,} paths*")
+        with st.expander("📊 Projected revenue by risk and utilization band"):
+            st.dataframe(per_bucket.astype({"risk_band": str, "utilization_band": str}),
+                         hide_index=True, use_container_width=True)
     else:
         st.info("👆 *Add customer data above to see real-time AI analysis and portfolio optimization!*")
 
 # ============================== ALL CUSTOMERS ==============================
-def build_customers_df(customers):
-    if not customers:
-        return pd.DataFrame()
-    df = pd.json_normalize(customers, sep=".")
-    if "timestamp" in df.columns:
-        df["timestamp"] = pd.to_datetime(df["timestamp"]).dt.strftime("%Y-%m-%d %H:%M:%S")
-    preferred = [
-        "id","name","current_limit","recommended_limit","utilization","payment_history",
-        "income","risk_score","opportunity","rate_reduction","spending_category",
-        "last_increase","market_context","added_by","timestamp"
-    ]
-    cols = [c for c in preferred if c in df.columns] + [c for c in df.columns if c not in preferred]
-    return df[cols]
-
 with tab_all:
     st.markdown("### 📋 Full Customer List")
-    if not st.session_state.customers:
+    if not len(portfolio):
         st.info("No customers yet. Add some on the Dashboard tab.")
     else:
-        df = build_customers_df(st.session_state.customers)
-        st.dataframe(df, use_container_width=True)
-
-        # CSV
-        csv_bytes = df.to_csv(index=False).encode("utf-8")
-        # Excel
-        excel_buf = io.BytesIO()
-        with pd.ExcelWriter(excel_buf, engine="xlsxwriter") as writer:
-            df.to_excel(writer, index=False, sheet_name="Customers")
-        excel_buf.seek(0)
-
-        dl1, dl2 = st.columns(2)
-        with dl1:
-            st.download_button("⬇ Download CSV", data=csv_bytes,
-                               file_name=f"customers_{st.session_state.user_info.get('name', 'user').replace(' ', '_')}.csv", 
-                               mime="text/csv", use_container_width=True)
-        with dl2:
-            st.download_button("⬇ Download Excel", data=excel_buf,
-                               file_name=f"customers_{st.session_state.user_info.get('name', 'user').replace(' ', '_')}.xlsx",
-                               mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                               use_container_width=True)
+        customers_df = portfolio.frame
+        f1, f2, f3, f4 = st.columns(4)
+        with f1:
+            opportunity_filter = st.multiselect("Opportunity", ["High", "Medium", "Low"])
+        with f2:
+            category_filter = st.multiselect("Spending Category", SPENDING_CATEGORIES)
+        with f3:
+            risk_filter = st.slider("Risk Score", *FORM_BOUNDS["risk_score"], FORM_BOUNDS["risk_score"])
+        with f4:
+            added_by_filter = st.multiselect("Added By", customers_df['added_by'].cat.categories.tolist())
+
+        s1, s2, s3 = st.columns([2, 1, 1])
+        with s1:
+            sort_by = st.selectbox("Sort by", ["timestamp", "name", "current_limit", "recommended_limit",
+                                               "utilization", "risk_score", "income", "opportunity", "rate_reduction"])
+        with s2:
+            descending = st.toggle("Descending", value=True)
+        with s3:
+            page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1)
+
+        query = dict(opportunity=tuple(opportunity_filter), spending_category=tuple(category_filter),
+                     risk_range=tuple(risk_filter), added_by=tuple(added_by_filter),
+                     sort_by=sort_by, ascending=not descending)
+        positions = portfolio_cached("queries", tuple(sorted(query.items())), lambda: portfolio.query(**query))
+
+        page_count = max(1, -(-len(positions) // page_size))
+        page = st.number_input(f"Page (of {page_count:,})", min_value=1, max_value=page_count, value=1)
+        st.caption(f"Showing {min(len(positions), (page - 1) * page_size + 1):,}–"
+                   f"{min(len(positions), page * page_size):,} of {len(positions):,} matching customers "
+                   f"({len(portfolio):,} total)")
+        st.dataframe(portfolio.page(positions, page, page_size), use_container_width=True, hide_index=True)
+
+        # Bulk approval signs off recommendations for every analyst, so it is admin-only and needs
+        # confirming; the confirmation is tied to the query it was asked for
+        is_admin = st.session_state.user_info.get('email', '') in Config.ADMIN_EMAILS
+        if st.button(f"✅ Approve all {len(positions):,} matching", type="primary",
+                     disabled=not (is_admin and len(positions)),
+                     help=None if is_admin else "Only admins (ADMIN_EMAILS) can approve customers in bulk"):
+            st.session_state.confirm_approve_all = query
+        if is_admin and len(positions) and st.session_state.confirm_approve_all == query:
+            active_filters = [f"{label}: {', '.join(values)}" for label, values in (
+                ("Opportunity", opportunity_filter), ("Spending Category", category_filter),
+                ("Added By", added_by_filter)) if values]
+            if tuple(risk_filter) != FORM_BOUNDS["risk_score"]:
+                active_filters.append(f"Risk Score: {risk_filter[0]}–{risk_filter[1]}")
+            st.warning(f"This approves the current recommendation of all {len(positions):,} customers matching "
+                       + ("; ".join(active_filters) if active_filters else "no filters (the whole portfolio)") + ".")
+            c_yes, c_no = st.columns(2)
+            if c_yes.button(f"Approve {len(positions):,} customers", type="primary"):
+                st.session_state.confirm_approve_all = None
+                approved = portfolio.approve_many(portfolio.frame['id'].iloc[positions].tolist(),
+                                                  st.session_state.user_info.get('email', 'unknown'))
+                flash_and_rerun(f"Approved {approved:,} recommendations "
+                                f"({len(positions) - approved:,} already approved)")
+            if c_no.button("Cancel", key="cancel_approve_all"):
+                st.session_state.confirm_approve_all = None
+                st.rerun()
+
+        def export_data(fmt):
+            """Deferred export: written in chunks to disk on first click, then cached by portfolio version"""
+            key, frame = (portfolio.uid, portfolio.version, fmt), portfolio.frame
+            return lambda: read_export(get_caches()["exports"], key, frame, fmt)
+
+        file_stem = f"customers_{st.session_state.user_info.get('name', 'user').replace(' ', '_')}"
+        export_labels = {"csv": "⬇ Download CSV", "xlsx": "⬇ Download Excel", "parquet": "⬇ Download Parquet"}
+        for column, fmt in zip(st.columns(len(EXPORT_FORMATS)), EXPORT_FORMATS):
+            extension, mime = EXPORT_FORMATS[fmt]
+            with column:
+                st.download_button(export_labels[fmt], data=export_data(fmt),
+                                   file_name=f"{file_stem}.{extension}", mime=mime,
+                                   use_container_width=True)
+
+        with st.expander(f"📒 Approval Ledger ({portfolio.stats.approved_count:,} approved in this book)"):
+            st.dataframe(get_portfolio_store().approval_ledger(limit=500), use_container_width=True, hide_index=True)
+            st.caption("Latest 500 ledger entries, newest first")
+
+        analyzed = analyzed_ids()
+        if analyzed:
+            st.markdown(f"### 🧠 AI Analyses ({len(analyzed):,})")
+            selected = st.selectbox("Customer", analyzed,
+                                    format_func=lambda cid: f"{cid} - {portfolio.get(cid)['name']}")
+            st.markdown(analysis_html(portfolio.get(selected)['name'], analysis_results[selected]),
+                        unsafe_allow_html=True)
 
 # ----------------------------- FOOTER STRAP -----------------------------
 st.markdown("---")
@@ -691,7 +950,7 @@ st.markdown(f"""
     <p><strong>Revolutionary Credit Intelligence • Live Market Integration • Immediate ROI Calculation</strong></p>
     <p style="margin-top: 1rem; font-size: 0.9rem; color: #666;">
         🔐 Secured by Google OAuth • Session managed by {st.session_state.user_info.get('name', 'User')} • 
-        {len(st.session_state.customers)} customers analyzed
+        {len(portfolio)} customers analyzed
     </p>
 </div>
 """, unsafe_allow_html=True)
\ No newline at end of file
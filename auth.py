@@ -1,10 +1,12 @@
 import streamlit as st
-import requests
 import urllib.parse
 import secrets
-import time
+import functools
 from datetime import datetime, timedelta
 from config import Config
+from flash import flash_and_rerun
+from http_client import get_session
+from id_tokens import user_info_from_claims, verify_id_token
 
 
 class GoogleOAuth:
@@ -15,8 +17,8 @@ class GoogleOAuth:
         self.redirect_uri = Config.GOOGLE_REDIRECT_URI
         self.auth_url = Config.GOOGLE_AUTH_URL
         self.token_url = Config.GOOGLE_TOKEN_URL
-        self.user_info_url = Config.GOOGLE_USER_INFO_URL
         self.scopes = Config.GOOGLE_SCOPES
+        self.http = get_session()
 
     def get_auth_url(self):
         """Generate Google OAuth authorization URL"""
@@ -48,36 +50,35 @@ class GoogleOAuth:
             'redirect_uri': self.redirect_uri
         }
 
-        response = requests.post(self.token_url, data=data)
+        response = self.http.post(self.token_url, data=data)
         response.raise_for_status()
 
         return response.json()
 
-    def get_user_info(self, access_token):
-        """Get user information from Google"""
-        headers = {'Authorization': f'Bearer {access_token}'}
-        response = requests.get(self.user_info_url, headers=headers)
-        response.raise_for_status()
-
-        return response.json()
+    def verify_id_token(self, id_token):
+        """Verify the ID token from the token response locally and return its claims"""
+        return verify_id_token(id_token, self.client_id)
 
     def is_admin_user(self, email):
         """Check if user is admin"""
         return email in Config.ADMIN_EMAILS
 
-    def login_user(self, user_info, access_token):
+    def login_user(self, claims, access_token):
         """Log in user and store session information"""
+        user_info = user_info_from_claims(claims)
         st.session_state.authenticated = True
         st.session_state.user_info = user_info
         st.session_state.access_token = access_token
+        # The ID token's exp (about an hour) was only checked when it was verified; the session lasts 24 hours
         st.session_state.login_time = datetime.now()
+        st.session_state.session_expires = st.session_state.login_time + timedelta(hours=24)
         st.session_state.is_admin = self.is_admin_user(user_info.get('email', ''))
 
     def logout_user(self):
         """Log out user and clear session"""
         keys_to_clear = [
             'authenticated', 'user_info', 'access_token',
-            'login_time', 'is_admin', 'oauth_state'
+            'login_time', 'session_expires', 'is_admin', 'oauth_state'
         ]
         for key in keys_to_clear:
             if key in st.session_state:
@@ -88,14 +89,20 @@ class GoogleOAuth:
         if not st.session_state.get('authenticated', False):
             return False
 
-        login_time = st.session_state.get('login_time')
-        if login_time and datetime.now() - login_time > timedelta(hours=24):
+        expires = st.session_state.get('session_expires')
+        if expires and datetime.now() >= expires:
             self.logout_user()
             return False
 
         return True
 
 
+@functools.lru_cache(maxsize=1)
+def get_oauth():
+    """Process-wide GoogleOAuth client; config is validated once, on first use"""
+    return GoogleOAuth()
+
+
 def render_login_page():
     """Render the login page"""
     st.markdown("""
@@ -139,7 +146,7 @@ def render_login_page():
     col1, col2, col3 = st.columns([1, 2, 1])
 
     with col2:
-        oauth = GoogleOAuth()
+        oauth = get_oauth()
         auth_url = oauth.get_auth_url()
 
         st.markdown(f"""
@@ -222,37 +229,33 @@ def render_user_header():
 
         with col3:
             if st.button("🚪 Logout", type="secondary"):
-                oauth = GoogleOAuth()
+                oauth = get_oauth()
                 oauth.logout_user()
                 st.rerun()
 
 
 def handle_oauth_callback():
     """Handle OAuth callback from Google"""
-    query_params = st.experimental_get_query_params()
+    query_params = st.query_params
 
     if 'code' in query_params and 'state' in query_params:
-        code = query_params['code'][0]
-        state = query_params['state'][0]
+        code = query_params['code']
+        state = query_params['state']
 
         try:
-            oauth = GoogleOAuth()
+            oauth = get_oauth()
             token_data = oauth.exchange_code_for_token(code, state)
-            access_token = token_data['access_token']
-
-            user_info = oauth.get_user_info(access_token)
-            oauth.login_user(user_info, access_token)
+            claims = oauth.verify_id_token(token_data['id_token'])
+            oauth.login_user(claims, token_data['access_token'])
 
             # Clear query params after successful login
-            st.experimental_set_query_params()
-            st.success(f"✅ Successfully logged in as {user_info.get('name', 'User')}")
-            time.sleep(1)
-            st.rerun()
+            st.query_params.clear()
+            flash_and_rerun(f"Successfully logged in as {st.session_state.user_info.get('name', 'User')}")
 
         except Exception as e:
             st.error(f"❌ Login failed: {str(e)}")
             st.info("Please try logging in again.")
-            oauth = GoogleOAuth()
+            oauth = get_oauth()
             oauth.logout_user()
 
 
@@ -260,7 +263,7 @@ def require_authentication(func):
     """Decorator to require authentication for functions"""
 
     def wrapper(*args, **kwargs):
-        oauth = GoogleOAuth()
+        oauth = get_oauth()
 
         if not oauth.is_session_valid():
             render_login_page()
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Namespace name -> (max entries, ttl seconds or None)
+NAMESPACES = {
+    "scoring": (32, None),
+    "exports": (32, None),
+    "queries": (64, None),
+    "charts": (64, None),
+}
+
+
+class CacheNamespace:
+    """Thread-safe LRU cache for one kind of data, with optional TTL
+
+    Keys are tuples; ``invalidate(prefix=...)`` drops every key that starts
+    with the given tuple (e.g. everything for one portfolio). ``on_evict``,
+    if set, is called with (key, value) for every entry that leaves the cache.
+    """
+
+    def __init__(self, name, maxsize=128, ttl=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.on_evict = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[1] <= self.ttl):
+                self._entries.move_to_end(key)
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+        if entry is not None:
+            self._evicted([(key, entry)])
+        return default
+
+    def set(self, key, value):
+        evicted = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None and previous[0] is not value:
+                evicted.append((key, previous))
+            self._entries[key] = (value, time.monotonic())
+            while len(self._entries) > self.maxsize:
+                evicted.append(self._entries.popitem(last=False))
+        self._evicted(evicted)
+        return value
+
+    def _evicted(self, entries):
+        if self.on_evict is not None:
+            for key, (value, _) in entries:
+                self.on_evict(key, value)
+
+    def get_or_set(self, key, factory):
+        """Return the cached value for key, computing and storing it on a miss"""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = self.set(key, factory())
+        return value
+
+    def invalidate(self, key=None, prefix=None):
+        """Drop one key, every key starting with prefix, or (with neither) the whole namespace"""
+        with self._lock:
+            if key is not None:
+                keys = [key] if key in self._entries else []
+            elif prefix is not None:
+                keys = [k for k in self._entries if k[:len(prefix)] == prefix]
+            else:
+                keys = list(self._entries)
+            evicted = [(k, self._entries.pop(k)) for k in keys]
+        self._evicted(evicted)
+
+
+class CacheRegistry:
+    """Process-wide set of independent cache namespaces"""
+
+    def __init__(self, namespaces=None):
+        self._lock = threading.Lock()
+        self._namespaces = {}
+        for name, (maxsize, ttl) in (namespaces or NAMESPACES).items():
+            self._namespaces[name] = CacheNamespace(name, maxsize, ttl)
+
+    def __getitem__(self, name):
+        return self.namespace(name)
+
+    def namespace(self, name, maxsize=128, ttl=None):
+        with self._lock:
+            if name not in self._namespaces:
+                self._namespaces[name] = CacheNamespace(name, maxsize, ttl)
+            return self._namespaces[name]
+
+    def invalidate(self, name, key=None, prefix=None):
+        """Invalidate entries in a single namespace, leaving all others untouched"""
+        self.namespace(name).invalidate(key=key, prefix=prefix)
@@ -0,0 +1,59 @@
+import numpy as np
+
+from portfolio import UTILIZATION_BIN_EDGES
+
+OPPORTUNITY_COLORS = {'High': '#28a745', 'Medium': '#ffc107', 'Low': '#dc3545'}
+
+
+def utilization_figure(bin_counts):
+    """Utilization histogram drawn from pre-binned counts (one bar per fixed bin)"""
+    import plotly.graph_objects as go
+
+    centers = (UTILIZATION_BIN_EDGES[:-1] + UTILIZATION_BIN_EDGES[1:]) / 2
+    widths = np.diff(UTILIZATION_BIN_EDGES)
+    fig = go.Figure(go.Bar(x=centers, y=np.asarray(bin_counts), width=widths,
+                           hovertemplate="%{x:.0f}% ± 5%: %{y} customers<extra></extra>"))
+    fig.update_layout(title="Credit Utilization (%)", height=250, showlegend=False, bargap=0.05,
+                      xaxis_title="Utilization %", yaxis_title="Customers")
+    return fig
+
+
+def opportunity_figure(opportunity_counts):
+    """Opportunity pie from running per-level counts"""
+    import plotly.graph_objects as go
+
+    counts = {level: n for level, n in opportunity_counts.items() if n > 0}
+    fig = go.Figure(go.Pie(labels=list(counts.keys()), values=list(counts.values()),
+                           marker_colors=[OPPORTUNITY_COLORS[level] for level in counts]))
+    fig.update_layout(height=250)
+    return fig
+
+
+def revenue_projection_figure(bands):
+    """Fan chart of simulated cumulative revenue: median with 50% and 90% bands"""
+    import plotly.graph_objects as go
+
+    months = [f"Month {m}" for m in bands.index]
+    fig = go.Figure()
+    for low, high, opacity, label in (("p5", "p95", 0.15, "90% band"), ("p25", "p75", 0.3, "50% band")):
+        fig.add_trace(go.Scatter(x=months, y=bands[high], line_width=0, showlegend=False, hoverinfo="skip"))
+        fig.add_trace(go.Scatter(x=months, y=bands[low], line_width=0, fill="tonexty", name=label,
+                                 fillcolor=f"rgba(31, 119, 180, {opacity})"))
+    fig.add_trace(go.Scatter(x=months, y=bands["p50"], name="Median", line_color="#1f77b4"))
+    fig.add_trace(go.Scatter(x=months, y=bands["mean"], name="Mean", line_dash="dot", line_color="#ff7f0e"))
+    fig.update_layout(title="Revenue Impact Projection (₹)", height=400,
+                      xaxis_title="Timeline", yaxis_title="Cumulative Revenue Impact (₹)")
+    return fig
+
+
+def scenario_heatmap(results):
+    """Revenue impact by S&P move and VIX level, averaged over rate moves"""
+    import plotly.graph_objects as go
+
+    grid = results.pivot_table(index="vix_level", columns="sp500_change", values="revenue_impact", aggfunc="mean")
+    fig = go.Figure(go.Heatmap(z=grid.to_numpy(), x=grid.columns, y=grid.index, colorscale="RdYlGn",
+                               colorbar_title="₹",
+                               hovertemplate="S&P %{x:+.1f}%, VIX %{y:.1f}: ₹%{z:,.0f}<extra></extra>"))
+    fig.update_layout(title="Stress-Test Revenue Impact (₹)", height=350,
+                      xaxis_title="S&P 500 change (%)", yaxis_title="VIX level")
+    return fig
@@ -3,6 +3,9 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Placeholder SECRET_KEY; it is public, so signed session tokens are disabled while it is in use
+DEFAULT_SECRET_KEY = "your-secret-key-change-in-production"
+
 
 class Config:
     # Google OAuth Configuration
@@ -11,20 +14,59 @@ class Config:
     GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI", "http://localhost:8501")
 
     # App Configuration
-    SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
-    ADMIN_EMAILS = os.getenv("ADMIN_EMAILS", "").split(",")
+    SECRET_KEY = os.getenv("SECRET_KEY", DEFAULT_SECRET_KEY)
+    ADMIN_EMAILS = [e.strip() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()]
+
+    # Local persistence
+    DATA_DIR = os.getenv("DATA_DIR", "data")
+
+    # Signed login sessions, so reloads resume without the OAuth round trip
+    SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(DATA_DIR, "sessions.db"))
+    SESSION_TTL_HOURS = float(os.getenv("SESSION_TTL_HOURS", "24"))
+
+    # Shared portfolio store
+    PORTFOLIO_STORE = os.getenv("PORTFOLIO_STORE", "sqlite")
+    PORTFOLIO_DB_PATH = os.getenv("PORTFOLIO_DB_PATH", os.path.join(DATA_DIR, "portfolio.db"))
+    PORTFOLIO_DB_POOL_SIZE = int(os.getenv("PORTFOLIO_DB_POOL_SIZE", "4"))
+
+    # Market Data Configuration
+    MARKET_DATA_PROVIDER = os.getenv("MARKET_DATA_PROVIDER", "yfinance")
+    MARKET_DATA_TTL = int(os.getenv("MARKET_DATA_TTL", "300"))
+    MARKET_DATA_RETRY = int(os.getenv("MARKET_DATA_RETRY", "30"))  # Seconds before retrying a failed fetch
+    MARKET_EXTRA_TICKERS = [t.strip() for t in os.getenv("MARKET_EXTRA_TICKERS", "").split(",") if t.strip()]
+    MARKET_DB_PATH = os.getenv("MARKET_DB_PATH", os.path.join(DATA_DIR, "market.db"))
+    MARKET_HISTORY_KEEP = int(os.getenv("MARKET_HISTORY_KEEP", "10000"))  # Snapshots kept in the history
+
+    # AI Analysis Configuration
+    ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "8"))
+    ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", os.path.join(DATA_DIR, "analysis_cache.db"))
+    ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", str(7 * 24 * 3600)))
+    ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "10000"))
+
+    # Revenue Simulation Configuration
+    SIMULATION_WORKERS = int(os.getenv("SIMULATION_WORKERS", "1"))
 
     # OAuth URLs
     GOOGLE_AUTH_URL = "https://accounts.google.com/o/oauth2/auth"
     GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
     GOOGLE_USER_INFO_URL = "https://www.googleapis.com/oauth2/v2/userinfo"
+    GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+
+    # Stand-in ID-token signing keys ({key id: PEM} JSON) for offline development and tests
+    GOOGLE_CERTS_FILE = os.getenv("GOOGLE_CERTS_FILE")
 
     # OAuth Scopes
     GOOGLE_SCOPES = [
+        "openid",
         "https://www.googleapis.com/auth/userinfo.email",
         "https://www.googleapis.com/auth/userinfo.profile"
     ]
 
+    @classmethod
+    def has_secret_key(cls):
+        """True if SECRET_KEY has been set to something other than the public placeholder"""
+        return bool(cls.SECRET_KEY) and cls.SECRET_KEY != DEFAULT_SECRET_KEY
+
     @classmethod
     def validate_config(cls):
         """Validate that all required config is present"""
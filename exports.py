@@ -0,0 +1,112 @@
+import os
+import tempfile
+
+from portfolio import DISPLAY_COLUMNS, display_frame
+
+# Format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+EXPORT_CHUNK_ROWS = 50000
+EXCEL_MAX_ROWS = 1048575  # Worksheet row limit, less the header
+
+
+def iter_display_chunks(frame, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Display-formatted slices of a portfolio frame, at most chunk_rows each"""
+    for start in range(0, len(frame), chunk_rows):
+        yield display_frame(frame.iloc[start:start + chunk_rows])
+
+
+def write_csv(frame, path, chunk_rows=EXPORT_CHUNK_ROWS):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        header = True
+        for chunk in iter_display_chunks(frame, chunk_rows):
+            chunk.to_csv(f, index=False, header=header)
+            header = False
+        if header:
+            f.write(",".join(DISPLAY_COLUMNS) + "\n")
+
+
+def write_parquet(frame, path, chunk_rows=EXPORT_CHUNK_ROWS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in iter_display_chunks(frame, chunk_rows):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_xlsx(frame, path, chunk_rows=EXPORT_CHUNK_ROWS):
+    import xlsxwriter
+
+    if len(frame) > EXCEL_MAX_ROWS:
+        raise ValueError(f"Excel export is limited to {EXCEL_MAX_ROWS:,} customers; use CSV or Parquet")
+    # constant_memory flushes each row to disk as soon as it is written
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    try:
+        worksheet = workbook.add_worksheet("Customers")
+        worksheet.write_row(0, 0, DISPLAY_COLUMNS)
+        row = 1
+        for chunk in iter_display_chunks(frame, chunk_rows):
+            for values in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None):
+                worksheet.write_row(row, 0, values)
+                row += 1
+    finally:
+        workbook.close()
+
+
+WRITERS = {
+    "csv": write_csv,
+    "xlsx": write_xlsx,
+    "parquet": write_parquet,
+}
+
+
+def write_export(frame, fmt, directory=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Stream a portfolio frame to a temporary file in the given format; returns its path"""
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    extension, _ = EXPORT_FORMATS[fmt]
+    fd, path = tempfile.mkstemp(prefix="portfolio_", suffix=f".{extension}", dir=directory)
+    os.close(fd)
+    try:
+        WRITERS[fmt](frame, path, chunk_rows)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def read_export(cache, key, frame, fmt, attempts=3):
+    """Contents of the export of ``frame`` cached under ``key``, written on the first request
+
+    Writing is chunked, but each download reads the whole file into memory:
+    st.download_button only takes bytes, so serving costs O(file size).
+    Another session can evict the entry (deleting its file) between the
+    lookup and the read; the stale entry is dropped and the file written again.
+    """
+    for attempt in range(attempts):
+        path = cache.get_or_set(key, lambda: write_export(frame, fmt))
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            if attempt == attempts - 1:
+                raise
+            if cache.get(key) == path:
+                cache.invalidate(key=key)
+
+
+def discard_export(key, path):
+    """Cache eviction hook: remove an export file that is no longer cached"""
+    if isinstance(path, str) and os.path.exists(path):
+        os.remove(path)
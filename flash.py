@@ -0,0 +1,21 @@
+import streamlit as st
+
+FLASH_KEY = "_flash_messages"
+ICONS = {"success": "✅", "info": "ℹ️", "warning": "⚠️", "error": "❌"}
+
+
+def flash(message, kind="success"):
+    """Queue a message to be shown as a toast on the next script run"""
+    st.session_state.setdefault(FLASH_KEY, []).append((message, ICONS.get(kind)))
+
+
+def flash_and_rerun(message, kind="success"):
+    """Queue a message and rerun straight away instead of sleeping so it can be read"""
+    flash(message, kind)
+    st.rerun()
+
+
+def show_flashed():
+    """Show every queued message as a toast, once"""
+    for message, icon in st.session_state.pop(FLASH_KEY, []):
+        st.toast(message, icon=icon)
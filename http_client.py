@@ -0,0 +1,53 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) seconds applied to every request that doesn't pass its own timeout
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Idempotent requests retry on connection errors, read errors and these statuses; POSTs (e.g. the
+# single-use OAuth code exchange) only retry when the connection was never made
+RETRY = Retry(
+    total=3,
+    backoff_factor=0.3,
+    status_forcelist=(429, 500, 502, 503, 504),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+
+class TimeoutSession(requests.Session):
+    """requests.Session that applies a default timeout"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def create_session(timeout=DEFAULT_TIMEOUT, retry=RETRY, pool_maxsize=16):
+    """Keep-alive session with bounded retries and timeouts"""
+    session = TimeoutSession(timeout)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Process-wide shared session, so repeated calls to the same host reuse connections"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
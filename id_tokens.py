@@ -0,0 +1,142 @@
+import base64
+import json
+import re
+import threading
+import time
+
+from google.auth import exceptions, jwt
+
+from config import Config
+from http_client import get_session
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+# Key sets are re-fetched after the server's Cache-Control max-age (or this default), and at most
+# once per MIN_REFRESH_INTERVAL when a token names a key we don't have (Google rotates keys daily)
+DEFAULT_KEYS_MAX_AGE = 3600
+MIN_REFRESH_INTERVAL = 60
+CLOCK_SKEW_SECONDS = 30
+
+
+class GoogleKeySource:
+    """Google's published ID-token signing certificates"""
+    name = "google"
+
+    def __init__(self, url=None):
+        self.url = url or Config.GOOGLE_CERTS_URL
+
+    def fetch(self):
+        response = get_session().get(self.url)
+        response.raise_for_status()
+        match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+        return response.json(), int(match.group(1)) if match else DEFAULT_KEYS_MAX_AGE
+
+
+class StaticKeySource:
+    """Fixed, network-free key set for offline development and tests
+
+    ``keys`` maps key IDs to PEM public keys or certificates; with ``path``
+    they are read from a JSON file of the same shape.
+    """
+    name = "static"
+
+    def __init__(self, keys=None, path=None):
+        self.keys = dict(keys or {})
+        self.path = path
+
+    def fetch(self):
+        if self.path:
+            with open(self.path) as f:
+                return json.load(f), DEFAULT_KEYS_MAX_AGE
+        return dict(self.keys), DEFAULT_KEYS_MAX_AGE
+
+
+class SigningKeys:
+    """Thread-safe cache of ID-token signing keys, refreshed when stale or when a new key ID appears
+
+    If a refresh fails the previous keys stay in use until the next attempt.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._expires = 0.0
+        self._fetched = float("-inf")
+
+    def _refresh(self):
+        self._fetched = time.monotonic()
+        try:
+            keys, max_age = self.source.fetch()
+        except Exception:
+            if not self._keys:
+                raise
+            self._expires = self._fetched + MIN_REFRESH_INTERVAL
+            return
+        self._keys = keys
+        self._expires = self._fetched + max_age
+
+    def get(self, key_id=None):
+        """Current key set, refreshed first if it is stale or lacks ``key_id``"""
+        with self._lock:
+            now = time.monotonic()
+            stale = now >= self._expires
+            unknown = key_id is not None and key_id not in self._keys
+            if stale or (unknown and now - self._fetched >= MIN_REFRESH_INTERVAL):
+                self._refresh()
+            return self._keys
+
+
+_signing_keys = None
+_signing_keys_lock = threading.Lock()
+
+
+def get_signing_keys():
+    """Process-wide signing key cache; uses GOOGLE_CERTS_FILE as a stand-in key set when set"""
+    global _signing_keys
+    if _signing_keys is None:
+        with _signing_keys_lock:
+            if _signing_keys is None:
+                source = (StaticKeySource(path=Config.GOOGLE_CERTS_FILE) if Config.GOOGLE_CERTS_FILE
+                          else GoogleKeySource())
+                _signing_keys = SigningKeys(source)
+    return _signing_keys
+
+
+def _key_id(token):
+    try:
+        header = token.split(".", 1)[0]
+        return json.loads(base64.urlsafe_b64decode(header + "=" * (-len(header) % 4))).get("kid")
+    except (ValueError, AttributeError):
+        raise ValueError("Malformed ID token")
+
+
+def verify_id_token(token, audience, keys=None):
+    """Verify an OpenID Connect ID token locally and return its claims
+
+    Checks the signature against the cached signing keys, plus issuer,
+    audience and expiry. Raises ValueError if the token is not valid.
+    """
+    keys = keys or get_signing_keys()
+    try:
+        claims = jwt.decode(token, certs=keys.get(_key_id(token)), audience=audience,
+                            clock_skew_in_seconds=CLOCK_SKEW_SECONDS)
+    except (exceptions.GoogleAuthError, ValueError) as e:
+        raise ValueError(f"Invalid ID token: {e}")
+    if claims.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError(f"Invalid ID token issuer: {claims.get('iss')}")
+    return claims
+
+
+def user_info_from_claims(claims):
+    """User profile from ID token claims, in the shape of Google's userinfo response"""
+    fields = {
+        "id": claims.get("sub"),
+        "email": claims.get("email"),
+        "verified_email": claims.get("email_verified"),
+        "name": claims.get("name", claims.get("email")),
+        "given_name": claims.get("given_name"),
+        "family_name": claims.get("family_name"),
+        "picture": claims.get("picture"),
+    }
+    return {key: value for key, value in fields.items() if value is not None}
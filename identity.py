@@ -0,0 +1,71 @@
+import hashlib
+import re
+import threading
+import unicodedata
+
+ID_PREFIX = "C"
+ID_WIDTH = 8  # C00000001 ... C99999999 (wider sequences still format, just unpadded)
+ID_BLOCK_SIZE = 256  # IDs reserved from the store per round trip
+
+
+def format_id(sequence):
+    """Customer ID for a sequence number"""
+    return f"{ID_PREFIX}{sequence:0{ID_WIDTH}d}"
+
+
+def id_sequence(customer_id):
+    """Sequence number of a customer ID, or 0 if it isn't one of ours"""
+    match = re.fullmatch(rf"{ID_PREFIX}(\d+)", str(customer_id))
+    return int(match.group(1)) if match else 0
+
+
+def normalize_name(name):
+    """Canonical form of a customer name for duplicate detection
+
+    Unicode-normalized, case-folded and with whitespace collapsed, so
+    "Jane  Doe" and "jane doe" are the same customer.
+    """
+    return " ".join(unicodedata.normalize("NFKC", str(name)).casefold().split())
+
+
+def name_key(name):
+    """Fixed-width hash of the normalized name, used as the store's uniqueness key"""
+    return hashlib.blake2b(normalize_name(name).encode("utf-8"), digest_size=12).hexdigest()
+
+
+class IdAllocator:
+    """Thread-safe, monotonic customer ID allocator
+
+    ``reserve(n)`` returns the first of n consecutive, never-before-issued
+    sequence numbers (e.g. from the shared store); IDs are handed out from
+    reserved blocks so most allocations don't touch the store. IDs are never
+    reused, even after customers are deleted; unused IDs in a block are
+    simply skipped if the process exits.
+    """
+
+    def __init__(self, reserve=None, start=1, block_size=ID_BLOCK_SIZE):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._reserve = reserve or self._reserve_local
+        self._local_next = start
+        self._next = 0
+        self._end = 0
+
+    def _reserve_local(self, n):
+        start = self._local_next
+        self._local_next += n
+        return start
+
+    def allocate(self, n=1):
+        """n new customer IDs, in increasing order"""
+        with self._lock:
+            sequences = []
+            while len(sequences) < n:
+                if self._next >= self._end:
+                    size = max(self.block_size, n - len(sequences))
+                    self._next = self._reserve(size)
+                    self._end = self._next + size
+                take = min(n - len(sequences), self._end - self._next)
+                sequences.extend(range(self._next, self._next + take))
+                self._next += take
+        return [format_id(s) for s in sequences]
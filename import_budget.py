@@ -0,0 +1,82 @@
+"""Import-time budget for the login page
+
+Renders app.py's unauthenticated login page in a fresh interpreter under
+``python -X importtime`` and checks that it stays within a time budget
+and never imports the heavy dependencies the dashboard loads on demand.
+
+    python import_budget.py                 # check against IMPORT_BUDGET_MS
+    python import_budget.py --budget 300 --top 20
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Only needed once a signed-in user reaches the code path that uses them
+HEAVY_MODULES = ("yfinance", "groq", "plotly", "xlsxwriter", "pandas", "numpy")
+
+# Cumulative import time (ms) allowed for the login page, not counting Streamlit's own lazy imports
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "100"))
+
+MARKER = "import-budget: login page"
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Streamlit and its test harness are imported before the marker; everything
+# imported after it is the cost of rendering app.py's login page
+PROBE = f"""
+import sys
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({os.path.join(ROOT, "app.py")!r}, default_timeout=60)
+print({MARKER!r}, file=sys.stderr, flush=True)
+at.run()
+if at.exception:
+    sys.exit(at.exception[0].message)
+"""
+
+
+def measure():
+    """(module, self ms, cumulative ms, depth) for every import made while rendering the login page"""
+    env = dict(os.environ, GOOGLE_CLIENT_ID="", GOOGLE_CLIENT_SECRET="")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], capture_output=True,
+                            text=True, env=env, cwd=ROOT)
+    lines = result.stderr.splitlines()
+    if result.returncode or MARKER not in lines:
+        raise RuntimeError(f"Login page failed to render:\n{result.stderr[-2000:]}")
+    imports = []
+    for line in lines[lines.index(MARKER) + 1:]:
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000, depth))
+    return imports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the login page's import-time budget")
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_MS, help="Budget in milliseconds")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list")
+    args = parser.parse_args(argv)
+
+    imports = measure()
+    top_level = [i for i in imports if i[3] == 0 and i[0].split(".")[0] != "streamlit"]
+    total = sum(cumulative for _, _, cumulative, _ in top_level)
+    heavy = sorted({name.split(".")[0] for name, *_ in imports} & set(HEAVY_MODULES))
+
+    print(f"Login page imports: {len(imports)} modules, {total:.1f} ms (budget {args.budget:.0f} ms)")
+    for name, _, cumulative, _ in sorted(top_level, key=lambda i: -i[2])[:args.top]:
+        print(f"  {cumulative:8.1f} ms  {name}")
+
+    failures = []
+    if total > args.budget:
+        failures.append(f"import time {total:.1f} ms is over the {args.budget:.0f} ms budget")
+    if heavy:
+        failures.append(f"heavy modules imported: {', '.join(heavy)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
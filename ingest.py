@@ -0,0 +1,217 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from identity import IdAllocator, normalize_name
+from scoring import USD_TO_INR, score_batch
+
+# Bounds mirror the number_input / slider widgets of the customer input form.
+# Values are in form units: limits and income in USD, utilization in percent.
+FORM_BOUNDS = {
+    "current_limit": (500, 100000),
+    "utilization": (0, 100),
+    "payment_history": (0, 100),
+    "income": (25000, 500000),
+    "risk_score": (300, 850),
+    "months_since_increase": (0, 120),
+}
+SPENDING_CATEGORIES = ["Groceries", "Gas", "Dining", "Travel", "Shopping", "Healthcare", "Business"]
+
+REQUIRED_COLUMNS = ["name", "current_limit", "income"]
+COLUMN_DEFAULTS = {
+    "utilization": 45,
+    "payment_history": 85,
+    "risk_score": 650,
+    "months_since_increase": 12,
+    "spending_category": "Groceries",
+}
+
+DEFAULT_CHUNKSIZE = 50000
+
+
+def detect_format(source, fmt=None):
+    """Work out whether a path or uploaded file is CSV or Parquet"""
+    if fmt:
+        return fmt.lower()
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    ext = os.path.splitext(name)[1].lower()
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    if ext in (".csv", ".txt", ""):
+        return "csv"
+    raise ValueError(f"Unsupported portfolio file type: {ext}")
+
+
+def read_chunks(source, fmt=None, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield the raw rows of a CSV or Parquet file as DataFrames of at most chunksize rows"""
+    fmt = detect_format(source, fmt)
+    if fmt == "csv":
+        with pd.read_csv(source, chunksize=chunksize) as reader:
+            for chunk in reader:
+                yield chunk
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(source)
+        for batch in parquet_file.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unsupported portfolio file type: {fmt}")
+
+
+def validate_chunk(chunk):
+    """Split a raw chunk into rows that pass the form's checks and rejected rows
+
+    Returns (valid, rejected); rejected carries a ``reason`` column.
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    df = chunk.copy()
+    for column, default in COLUMN_DEFAULTS.items():
+        if column not in df.columns:
+            df[column] = default
+
+    reason = pd.Series("", index=df.index, dtype=object)
+
+    df["name"] = df["name"].astype("string").str.strip()
+    reason = reason.mask((reason == "") & (df["name"].isna() | (df["name"] == "")), "missing name")
+
+    for column, (low, high) in FORM_BOUNDS.items():
+        values = pd.to_numeric(df[column], errors="coerce")
+        out_of_bounds = values.isna() | (values < low) | (values > high)
+        reason = reason.mask((reason == "") & out_of_bounds, f"{column} outside {low}-{high}")
+        reason = reason.mask((reason == "") & (values % 1 != 0), f"{column} must be a whole number")
+        df[column] = values
+
+    canonical = {c.lower(): c for c in SPENDING_CATEGORIES}
+    categories = df["spending_category"].astype("string").str.strip().str.lower().map(canonical)
+    reason = reason.mask((reason == "") & categories.isna(), "unknown spending_category")
+    df["spending_category"] = categories
+
+    rejected = chunk.loc[reason != ""].assign(reason=reason[reason != ""])
+    return df.loc[reason == ""], rejected
+
+
+def to_customer_frame(valid, market_data, added_by, ids, timestamp=None):
+    """Convert validated form-unit rows into scored portfolio rows (INR, fractional utilization)"""
+    timestamp = timestamp or datetime.now()
+    current_limit = (valid["current_limit"].to_numpy(dtype=float) * USD_TO_INR).astype(np.int64)
+    utilization = valid["utilization"].to_numpy(dtype=float) / 100
+    months = valid["months_since_increase"].to_numpy(dtype=np.int64)
+
+    customers = pd.DataFrame({
+        "id": list(ids),
+        "name": valid["name"].to_numpy(dtype=object),
+        "current_limit": current_limit,
+        "utilization": utilization,
+        "payment_history": valid["payment_history"].to_numpy(dtype=np.int64),
+        "income": (valid["income"].to_numpy(dtype=float) * USD_TO_INR).astype(np.int64),
+        "risk_score": valid["risk_score"].to_numpy(dtype=np.int64),
+        "months_since_increase": months,
+        "spending_category": valid["spending_category"].to_numpy(dtype=object),
+    })
+    customers["category_spend"] = [
+        {category.lower(): int(limit * util * 0.6)}
+        for category, limit, util in zip(customers["spending_category"], current_limit, utilization)
+    ]
+
+    scored = score_batch(customers, market_data)
+    customers["opportunity"] = scored["opportunity"].astype(str)
+    customers["recommended_limit"] = scored["recommended_limit"]
+    customers["rate_reduction"] = scored["rate_reduction"]
+    customers["market_context"] = f"Imported during {market_data['sp500_change']:+.1f}% market day"
+    customers["timestamp"] = timestamp
+    customers["added_by"] = added_by
+    return customers
+
+
+def stream_scored_chunks(source, market_data, added_by, existing_names=None, allocate_ids=None,
+                         fmt=None, chunksize=DEFAULT_CHUNKSIZE, report=None):
+    """Read, validate, de-duplicate and score a portfolio file one chunk at a time
+
+    Yields scored customer frames. ``existing_names`` (normalized, see
+    identity.normalize_name) is updated in place so duplicates are caught
+    across chunks; ``allocate_ids(n)`` supplies customer IDs (default: a
+    fresh sequence from 1); ``report`` (a dict) accumulates
+    read/accepted/rejected counts and a sample of rejected rows.
+    """
+    seen = existing_names if existing_names is not None else set()
+    allocate_ids = allocate_ids or IdAllocator().allocate
+    report = report if report is not None else {}
+    report.setdefault("read", 0)
+    report.setdefault("accepted", 0)
+    report.setdefault("rejected", 0)
+    report.setdefault("rejected_sample", [])
+
+    for chunk in read_chunks(source, fmt=fmt, chunksize=chunksize):
+        report["read"] += len(chunk)
+        valid, rejected = validate_chunk(chunk)
+
+        normalized = valid["name"].map(normalize_name)
+        duplicate = normalized.isin(seen) | normalized.duplicated()
+        if duplicate.any():
+            duplicates = chunk.loc[duplicate[duplicate].index].assign(reason="duplicate name")
+            rejected = pd.concat([rejected, duplicates])
+            valid = valid.loc[~duplicate]
+            normalized = normalized.loc[~duplicate]
+
+        report["rejected"] += len(rejected)
+        if len(report["rejected_sample"]) < 100:
+            report["rejected_sample"].extend(rejected.head(100 - len(report["rejected_sample"])).to_dict("records"))
+        if valid.empty:
+            continue
+
+        seen.update(normalized)
+        customers = to_customer_frame(valid, market_data, added_by, allocate_ids(len(valid)))
+        report["accepted"] += len(customers)
+        yield customers
+
+
+def main(argv=None):
+    """Score a portfolio file from the command line, streaming the result to CSV or Parquet"""
+    parser = argparse.ArgumentParser(description="Stream-score a CSV/Parquet customer portfolio")
+    parser.add_argument("input", help="CSV or Parquet file with one customer per row (form units)")
+    parser.add_argument("output", help="Destination .csv or .parquet file for scored customers")
+    parser.add_argument("--format", dest="fmt", choices=["csv", "parquet"], help="Input format (default: from extension)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--sp500-change", type=float, default=0.0, help="S&P 500 daily change (%%) used for market_factor")
+    parser.add_argument("--added-by", default="bulk-import")
+    args = parser.parse_args(argv)
+
+    market_data = {"sp500_change": args.sp500_change}
+    out_fmt = detect_format(args.output)
+    report = {}
+    writer = None
+    header = True
+    try:
+        for customers in stream_scored_chunks(args.input, market_data, args.added_by, fmt=args.fmt,
+                                              chunksize=args.chunksize, report=report):
+            customers = customers.drop(columns=["category_spend"])
+            if out_fmt == "parquet":
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(customers, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(args.output, table.schema)
+                writer.write_table(table)
+            else:
+                customers.to_csv(args.output, mode="w" if header else "a", header=header, index=False)
+                header = False
+    finally:
+        if writer is not None:
+            writer.close()
+
+    print(f"Read {report.get('read', 0):,} rows: {report.get('accepted', 0):,} scored, "
+          f"{report.get('rejected', 0):,} rejected")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from config import Config
+from market_store import MarketSnapshotStore
+
+# Snapshot key -> (ticker symbol, history period)
+CORE_TICKERS = {
+    "sp500": ("^GSPC", "2d"),
+    "vix": ("^VIX", "1d"),
+    "treasury": ("^TNX", "1d"),
+}
+
+# Ranges used when a ticker cannot be fetched and nothing better is available
+SIMULATED_RANGES = {
+    "sp500_change": (-2, 2),
+    "vix_level": (12, 35),
+    "treasury_rate": (4.2, 5.8),
+}
+
+
+class YFinanceProvider:
+    """Live closes from Yahoo Finance"""
+    name = "live"
+
+    def fetch_closes(self, symbol, period):
+        import yfinance as yf
+
+        return yf.Ticker(symbol).history(period=period)["Close"].tolist()
+
+
+class StaticProvider:
+    """Fixed, network-free closes for offline development and tests"""
+    name = "static"
+
+    DEFAULT_CLOSES = {
+        "^GSPC": [5000.0, 5025.0],
+        "^VIX": [18.5],
+        "^TNX": [4.6],
+    }
+
+    def __init__(self, closes=None, delay=0.0):
+        self.closes = dict(self.DEFAULT_CLOSES, **(closes or {}))
+        self.delay = delay
+
+    def fetch_closes(self, symbol, period):
+        if self.delay:
+            time.sleep(self.delay)
+        return list(self.closes.get(symbol, []))
+
+
+PROVIDERS = {
+    "yfinance": YFinanceProvider,
+    "static": StaticProvider,
+}
+
+
+def get_provider(name):
+    """Instantiate a market data provider by its configured name"""
+    try:
+        return PROVIDERS[name.lower()]()
+    except KeyError:
+        raise ValueError(f"Unknown market data provider: {name}")
+
+
+def simulated_snapshot(error=None):
+    """Randomised placeholder used when no real data has ever been fetched"""
+    snapshot = {key: random.uniform(low, high) for key, (low, high) in SIMULATED_RANGES.items()}
+    snapshot.update({'timestamp': datetime.now(), 'data_source': 'simulated', 'extra': {}})
+    if error:
+        snapshot['error'] = error
+    return snapshot
+
+
+def build_snapshot(closes, source, extra_tickers=(), fallback=None):
+    """Turn per-ticker closes into the market_data dict used by the app
+
+    Values that could not be fetched come from ``fallback`` (the last good
+    snapshot) when given, and are only simulated when there is nothing else.
+    """
+    sp500 = closes.get("sp500") or []
+    vix = closes.get("vix") or []
+    treasury = closes.get("treasury") or []
+
+    def missing(key):
+        if fallback is not None:
+            return fallback[key]
+        return random.uniform(*SIMULATED_RANGES[key])
+
+    if len(sp500) >= 2:
+        sp500_change = ((sp500[-1] - sp500[-2]) / sp500[-2]) * 100
+    else:
+        sp500_change = missing('sp500_change')
+
+    if sp500:
+        data_source = source
+    else:
+        data_source = 'cached' if fallback is not None else 'simulated'
+
+    snapshot = {
+        'sp500_change': sp500_change,
+        'vix_level': vix[-1] if vix else missing('vix_level'),
+        'treasury_rate': treasury[-1] if treasury else missing('treasury_rate'),
+        'timestamp': datetime.now() if sp500 or fallback is None else fallback['timestamp'],
+        'data_source': data_source,
+        'extra': {symbol: closes[symbol][-1] for symbol in extra_tickers if closes.get(symbol)},
+    }
+    errors = closes.get("_errors")
+    if errors:
+        snapshot['error'] = "; ".join(errors)
+    return snapshot
+
+
+class MarketDataService:
+    """Stale-while-revalidate market data shared by every session in the process
+
+    ``get()`` always answers from memory. When the snapshot is older than
+    ``ttl`` a single background refresh is started and callers keep getting
+    the previous snapshot until it lands; until the first good fetch every
+    snapshot counts as stale, and after a failed fetch the next is retried
+    ``retry_after`` seconds later. All tickers are fetched in parallel.
+    With a ``store``, good fetches are recorded and the last one is served on
+    startup and whenever a fetch fails; only the newest ``history_keep``
+    snapshots are retained.
+    """
+
+    def __init__(self, provider, ttl=300, extra_tickers=(), cold_start_timeout=3.0, store=None,
+                 history_keep=10000, retry_after=30):
+        self.provider = provider
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.extra_tickers = tuple(extra_tickers)
+        self.cold_start_timeout = cold_start_timeout
+        self._tickers = dict(CORE_TICKERS)
+        self._tickers.update({symbol: (symbol, "1d") for symbol in self.extra_tickers})
+        self._executor = ThreadPoolExecutor(max_workers=len(self._tickers) + 1,
+                                            thread_name_prefix="market-data")
+        self._lock = threading.Lock()
+        self.store = store
+        self.history_keep = history_keep
+        self._snapshot = store.latest() if store is not None else None
+        # monotonic times of the last good and the last failed fetch; None until one happens
+        self._fetched_at = None
+        self._failed_at = None
+        self._inflight = None
+
+    @classmethod
+    def from_config(cls):
+        return cls(get_provider(Config.MARKET_DATA_PROVIDER),
+                   ttl=Config.MARKET_DATA_TTL,
+                   extra_tickers=Config.MARKET_EXTRA_TICKERS,
+                   store=MarketSnapshotStore(Config.MARKET_DB_PATH),
+                   history_keep=Config.MARKET_HISTORY_KEEP,
+                   retry_after=Config.MARKET_DATA_RETRY)
+
+    def _fetch_one(self, key):
+        symbol, period = self._tickers[key]
+        return self.provider.fetch_closes(symbol, period)
+
+    def fetch(self):
+        """Fetch every configured ticker concurrently and build a fresh snapshot"""
+        futures = {key: self._executor.submit(self._fetch_one, key) for key in self._tickers}
+        closes, errors = {}, []
+        for key, future in futures.items():
+            try:
+                closes[key] = future.result()
+            except Exception as e:
+                errors.append(f"{self._tickers[key][0]}: {e}")
+        if errors:
+            closes["_errors"] = errors
+        with self._lock:
+            last = self._snapshot if self._snapshot and self._snapshot['data_source'] != 'simulated' else None
+        return build_snapshot(closes, self.provider.name, self.extra_tickers, fallback=last)
+
+    def _refresh(self):
+        snapshot, error = None, None
+        try:
+            snapshot = self.fetch()
+            if self.store is not None and snapshot['data_source'] == self.provider.name:
+                self.store.record(snapshot)
+                self.store.prune(self.history_keep)
+        except Exception as e:
+            error = str(e)
+        with self._lock:
+            if snapshot is not None:
+                self._snapshot = snapshot
+            elif self._snapshot is None:
+                self._snapshot = simulated_snapshot(error)
+            # A snapshot with errors was patched from the last good one (or simulated), so retry it soon
+            if snapshot is not None and 'error' not in snapshot:
+                self._fetched_at, self._failed_at = time.monotonic(), None
+            else:
+                self._failed_at = time.monotonic()
+            self._inflight = None
+
+    def refresh(self):
+        """Start a background refresh (at most one at a time); returns its future"""
+        with self._lock:
+            if self._inflight is None:
+                self._inflight = self._executor.submit(self._refresh)
+            return self._inflight
+
+    def history(self, since=None, limit=None):
+        """Recorded snapshot time series, or None without a store"""
+        if self.store is None:
+            return None
+        return self.store.history(since=since, limit=limit)
+
+    def _stale(self, now):
+        if self._failed_at is not None and now - self._failed_at <= self.retry_after:
+            return False
+        return self._fetched_at is None or now - self._fetched_at > self.ttl
+
+    def get(self):
+        """Current snapshot, never blocking on the network once warm"""
+        with self._lock:
+            snapshot = self._snapshot
+            stale = self._stale(time.monotonic())
+        if snapshot is None:
+            inflight = self.refresh()
+            try:
+                inflight.result(timeout=self.cold_start_timeout)
+            except Exception:
+                return simulated_snapshot("Market data still loading")
+            return self._snapshot
+        if stale:
+            self.refresh()
+        return snapshot
@@ -0,0 +1,105 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from scoring import market_factor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS market_snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fetched_at REAL NOT NULL,
+    sp500_change REAL NOT NULL,
+    vix_level REAL NOT NULL,
+    treasury_rate REAL NOT NULL,
+    data_source TEXT NOT NULL,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_market_snapshots_fetched_at ON market_snapshots (fetched_at);
+"""
+
+
+class MarketSnapshotStore:
+    """SQLite history of every good market data fetch
+
+    Survives restarts, so a fresh process can serve the last recorded
+    snapshot immediately instead of waiting on the network.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def record(self, snapshot):
+        """Append a snapshot; simulated placeholders are never recorded"""
+        if snapshot.get('data_source') == 'simulated':
+            return False
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO market_snapshots (fetched_at, sp500_change, vix_level, treasury_rate, data_source, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (snapshot['timestamp'].timestamp(), float(snapshot['sp500_change']), float(snapshot['vix_level']),
+                 float(snapshot['treasury_rate']), snapshot['data_source'], json.dumps(snapshot.get('extra', {}))),
+            )
+        return True
+
+    def latest(self):
+        """Most recent recorded snapshot as a market_data dict, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fetched_at, sp500_change, vix_level, treasury_rate, extra "
+                "FROM market_snapshots ORDER BY fetched_at DESC LIMIT 1"
+            ).fetchone()
+        if row is None:
+            return None
+        fetched_at, sp500_change, vix_level, treasury_rate, extra = row
+        return {
+            'sp500_change': sp500_change,
+            'vix_level': vix_level,
+            'treasury_rate': treasury_rate,
+            'timestamp': datetime.fromtimestamp(fetched_at),
+            'data_source': 'cached',
+            'extra': json.loads(extra),
+        }
+
+    def history(self, since=None, limit=None):
+        """Recorded snapshots as a time-indexed DataFrame, oldest first
+
+        Includes the market_factor each snapshot implies, so scoring inputs can
+        be smoothed or back-tested over recorded history.
+        """
+        query = "SELECT fetched_at, sp500_change, vix_level, treasury_rate, data_source FROM market_snapshots"
+        params = []
+        if since is not None:
+            query += " WHERE fetched_at >= ?"
+            params.append(since.timestamp())
+        query += " ORDER BY fetched_at DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        df = pd.DataFrame(rows, columns=["fetched_at", "sp500_change", "vix_level", "treasury_rate", "data_source"])
+        df["timestamp"] = pd.to_datetime([datetime.fromtimestamp(t) for t in df.pop("fetched_at")])
+        df = df.set_index("timestamp").sort_index()
+        df["market_factor"] = market_factor(df["sp500_change"].to_numpy())
+        return df
+
+    def prune(self, keep):
+        """Delete all but the newest ``keep`` snapshots"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM market_snapshots WHERE id NOT IN "
+                "(SELECT id FROM market_snapshots ORDER BY fetched_at DESC LIMIT ?)",
+                (int(keep),),
+            )
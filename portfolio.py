@@ -0,0 +1,537 @@
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from identity import IdAllocator, id_sequence, normalize_name
+from ingest import SPENDING_CATEGORIES
+from scoring import OPPORTUNITY_LEVELS, REVENUE_RATE, score_batch
+
+PORTFOLIO_DTYPES = {
+    "id": "string",
+    "name": "string",
+    "current_limit": "int64",
+    "recommended_limit": "int64",
+    "utilization": "float32",
+    "payment_history": "int16",
+    "income": "int64",
+    "risk_score": "int16",
+    "months_since_increase": "int16",
+    "opportunity": pd.CategoricalDtype(OPPORTUNITY_LEVELS),
+    "rate_reduction": "float32",
+    "spending_category": pd.CategoricalDtype(SPENDING_CATEGORIES),
+    "category_spend": "int64",
+    "market_context": "category",
+    "added_by": "category",
+    "timestamp": "datetime64[ns]",
+}
+
+# Fixed 10%-wide utilization bins (percent); the last bin includes 100%
+UTILIZATION_BIN_EDGES = np.linspace(0, 100, 11)
+
+DISPLAY_COLUMNS = [
+    "id", "name", "current_limit", "recommended_limit", "utilization", "payment_history",
+    "income", "risk_score", "months_since_increase", "opportunity", "rate_reduction", "spending_category",
+    "category_spend", "last_increase", "market_context", "added_by", "timestamp"
+]
+
+
+def empty_frame():
+    """Typed, zero-row portfolio frame"""
+    return pd.DataFrame({c: pd.Series(dtype=t) for c, t in PORTFOLIO_DTYPES.items()})
+
+
+def display_frame(frame):
+    """Flat frame for tables and exports, with derived text columns"""
+    df = frame.copy()
+    months = df["months_since_increase"]
+    df["last_increase"] = (months.astype(str) + " months ago").where(months > 0, "never")
+    df["timestamp"] = df["timestamp"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    return df[DISPLAY_COLUMNS]
+
+
+def query_positions(frame, opportunity=None, spending_category=None, risk_range=None, added_by=None,
+                    sort_by=None, ascending=True):
+    """Row positions matching the filters, in sort order
+
+    ``opportunity``, ``spending_category`` and ``added_by`` are collections of
+    allowed values (None or empty means no filter); ``risk_range`` is an
+    inclusive (low, high) pair. Categorical columns sort in category order.
+    """
+    mask = np.ones(len(frame), dtype=bool)
+    for column, allowed in (("opportunity", opportunity), ("spending_category", spending_category),
+                            ("added_by", added_by)):
+        if allowed:
+            mask &= frame[column].isin(list(allowed)).to_numpy()
+    if risk_range is not None:
+        risk = frame["risk_score"].to_numpy()
+        mask &= (risk >= risk_range[0]) & (risk <= risk_range[1])
+    positions = np.flatnonzero(mask)
+
+    if sort_by:
+        column = frame[sort_by]
+        values = column.cat.codes.to_numpy() if isinstance(column.dtype, pd.CategoricalDtype) \
+            else column.to_numpy()
+        order = np.argsort(values[positions], kind="stable")
+        positions = positions[order if ascending else order[::-1]]
+    return positions
+
+
+def approval_key(customer_id, recommended_limit):
+    """Idempotency key for approving one recommendation: re-approving the latest approved limit is a no-op"""
+    return f"{customer_id}:{int(recommended_limit)}"
+
+
+def coerce_frame(customers):
+    """Cast customer rows (DataFrame or list of dicts) to the portfolio's columnar schema
+
+    A nested ``category_spend`` dict, as produced by the input form, is
+    flattened to its single amount.
+    """
+    df = customers if isinstance(customers, pd.DataFrame) else pd.DataFrame(list(customers))
+    df = df.copy()
+    if "category_spend" in df.columns and df["category_spend"].dtype == object:
+        df["category_spend"] = [sum(v.values()) if isinstance(v, dict) else v for v in df["category_spend"]]
+    missing = [c for c in PORTFOLIO_DTYPES if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing portfolio columns: {', '.join(missing)}")
+    return df[list(PORTFOLIO_DTYPES)].astype(PORTFOLIO_DTYPES)
+
+
+class PortfolioStats:
+    """Running portfolio aggregates, updated by deltas so reads are O(1)
+
+    ``add``/``remove`` take the rows entering or leaving the portfolio; an
+    update is a remove of the old rows followed by an add of the new ones.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.count = 0
+        self.total_limit = 0
+        self.total_recommended = 0
+        self.utilization_sum = 0.0
+        self.opportunity_counts = {level: 0 for level in OPPORTUNITY_LEVELS}
+        self.utilization_bins = np.zeros(len(UTILIZATION_BIN_EDGES) - 1, dtype=np.int64)
+        self.approved_count = 0
+        self.approved_revenue = 0.0
+
+    def _apply(self, rows, sign):
+        self.count += sign * len(rows)
+        self.total_limit += sign * int(rows["current_limit"].sum())
+        self.total_recommended += sign * int(rows["recommended_limit"].sum())
+        self.utilization_sum += sign * float(rows["utilization"].astype("float64").sum())
+        for level, n in rows["opportunity"].value_counts().items():
+            self.opportunity_counts[level] += sign * int(n)
+        # Utilization is float32, so 0.7 * 100 comes out as 69.99999...; round off the float32 noise so
+        # whole percentages land in the bin they start rather than the one below
+        percent = np.round(rows["utilization"].to_numpy(dtype=float) * 100, 3)
+        counts, _ = np.histogram(percent, bins=UTILIZATION_BIN_EDGES)
+        self.utilization_bins += sign * counts
+
+    def add(self, rows):
+        self._apply(rows, 1)
+
+    def remove(self, rows):
+        self._apply(rows, -1)
+
+    @property
+    def avg_utilization(self):
+        return self.utilization_sum / self.count if self.count else 0.0
+
+
+class Portfolio:
+    """Columnar customer portfolio with O(1) lookup by customer ID and normalized name
+
+    Rows are held in one typed DataFrame. Appends are buffered and folded in
+    on the next read, so a bulk import of many chunks only concatenates once.
+    ``(uid, version)`` identifies the current contents and can be used as a
+    cache key; ``version`` increases on every mutation. ``stats`` holds
+    running aggregates maintained on every insert, update and delete.
+    Approvals are idempotent per (customer, recommended limit); the latest
+    approval of each customer in the book counts towards the stats.
+
+    With a ``store`` (see portfolio_store) the portfolio is loaded from it
+    and every mutation is written through; ``sync()`` fetches only the rows
+    another process has written or deleted since and patches them in.
+    Mutations are serialized, so one instance can be shared by every session
+    in the process.
+    """
+
+    def __init__(self, customers=None, store=None):
+        self.uid = uuid.uuid4().hex
+        self.store = store
+        self._lock = threading.RLock()
+        self._frame = empty_frame()
+        self._pending = []
+        self._positions = {}
+        self._names = {}
+        self._approvals = {}
+        self.stats = PortfolioStats()
+        self.version = 0
+        self._store_versions = {}
+        self._next_sequence = 1
+        self._ids = IdAllocator(reserve=self._reserve_ids)
+        if store is not None:
+            self._load()
+        if customers is not None and len(customers):
+            self.append(customers)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, customer_id):
+        return customer_id in self._positions
+
+    @property
+    def frame(self):
+        """The consolidated typed DataFrame (treat as read-only)"""
+        with self._lock:
+            if self._pending:
+                frame = pd.concat([self._frame] + self._pending, ignore_index=True)
+                # Open categories (market_context, added_by) widen to object when chunks disagree
+                self._frame = frame.astype({c: t for c, t in PORTFOLIO_DTYPES.items() if frame[c].dtype != t})
+                self._pending = []
+            return self._frame
+
+    def _set_frame(self, frame):
+        """Replace every row and rebuild the indexes and stats"""
+        self._frame = frame.reset_index(drop=True)
+        self._pending = []
+        self._index_rows()
+        self.stats.clear()
+        self.stats.add(self._frame)
+        self._apply_approvals(self._approvals, replace=True)
+        self.version += 1
+
+    def _index_rows(self):
+        self._positions = dict(zip(self._frame["id"].tolist(), range(len(self._frame))))
+        self._names = {normalize_name(name): cid for name, cid in zip(self._frame["name"], self._frame["id"])}
+
+    def _add_rows(self, df):
+        """Buffer new rows and index them"""
+        ids = df["id"].tolist()
+        start = len(self)
+        self._positions.update(zip(ids, range(start, start + len(ids))))
+        self._names.update(zip((normalize_name(name) for name in df["name"]), ids))
+        self._pending.append(df)
+        self.stats.add(df)
+
+    def _updated_frame(self, columns, positions=None):
+        """Copy of the frame with columns overwritten at positions (default: every row); see update_columns"""
+        frame = self.frame.copy()
+        rows = slice(None) if positions is None else np.asarray(positions, dtype=np.intp)
+        for column, values in columns.items():
+            dtype = PORTFOLIO_DTYPES[column]
+            if positions is None:
+                frame[column] = pd.Series(values, index=frame.index).astype(dtype)
+            else:
+                updated = frame[column].copy()
+                if isinstance(dtype, str) and dtype == "category":
+                    # Register new labels on open categoricals first, so the column is never rebuilt
+                    categories = updated.cat.categories
+                    labels = pd.Index(pd.unique(np.asarray(values, dtype=object))).difference(categories)
+                    if len(labels):
+                        updated = updated.cat.add_categories(labels.astype(categories.dtype))
+                updated.iloc[rows] = pd.Series(values, index=updated.index[rows]).astype(updated.dtype)
+                frame[column] = updated
+        return frame, rows
+
+    def _drop_rows(self, drop):
+        """Delete the rows at positions ``drop``; only rows after the first dropped one are re-indexed"""
+        frame = self.frame
+        dropped = frame.iloc[drop]
+        self.stats.remove(dropped)
+        self._drop_approvals(dropped["id"].tolist())
+        for cid, name in zip(dropped["id"], dropped["name"]):
+            del self._positions[cid]
+            self._names.pop(normalize_name(name), None)
+        keep = np.ones(len(frame), dtype=bool)
+        keep[drop] = False
+        self._frame = frame.iloc[keep].reset_index(drop=True)
+        first = min(drop)
+        self._positions.update(zip(self._frame["id"].iloc[first:].tolist(), range(first, len(self._frame))))
+
+    def _apply_approvals(self, approvals, replace=False):
+        """Fold {customer_id: (approval key, revenue impact)} into the approvals and their stats
+
+        Approvals of customers not in the book are ignored. Each entry moves
+        the stats by its difference from the customer's previous approval;
+        ``replace`` swaps in a whole new set and re-sums.
+        """
+        if replace:
+            self._approvals = {cid: entry for cid, entry in approvals.items() if cid in self._positions}
+            self.stats.approved_count = len(self._approvals)
+            self.stats.approved_revenue = float(sum(revenue for _, revenue in self._approvals.values()))
+            return
+        for cid, entry in approvals.items():
+            if cid not in self._positions:
+                continue
+            previous = self._approvals.get(cid)
+            if previous is None:
+                self.stats.approved_count += 1
+            else:
+                self.stats.approved_revenue -= previous[1]
+            self.stats.approved_revenue += entry[1]
+            self._approvals[cid] = entry
+
+    def _drop_approvals(self, customer_ids):
+        """Take the approvals of customers leaving the book out of the approvals and their stats"""
+        for cid in customer_ids:
+            entry = self._approvals.pop(cid, None)
+            if entry is not None:
+                self.stats.approved_count -= 1
+                self.stats.approved_revenue -= entry[1]
+
+    def _load(self):
+        frame, approvals, self._store_versions = self.store.load()
+        self._set_frame(frame)
+        self._apply_approvals(approvals, replace=True)
+        self.store.check_in(self.uid, "customers", self._store_versions["customers"])
+
+    def _stored(self, name, version):
+        """Record a version returned by a store write; False, recording nothing, if another writer got in first
+
+        On False the caller leaves its write unapplied and calls ``_sync()``,
+        which fetches it back along with the other writer's changes.
+        """
+        if version != self._store_versions[name] + 1:
+            return False
+        self._store_versions[name] = version
+        return True
+
+    def _sync(self):
+        """Patch in every customer and approval written to the store since the versions last seen
+
+        Falls back to a full load when most of the book was rewritten (say a
+        re-score of every customer), where patching would cost more.
+        """
+        changed, deleted, approvals, versions = self.store.changes(self._store_versions, max_rows=len(self) // 2)
+        if changed is None:
+            self._load()
+            return
+        drop = [self._positions[cid] for cid in deleted if cid in self._positions]
+        if drop:
+            self._drop_rows(drop)
+        if len(changed):
+            known = np.array([cid in self._positions for cid in changed["id"]], dtype=bool)
+            updates = changed[known]
+            if len(updates):
+                positions = [self._positions[cid] for cid in updates["id"]]
+                frame, rows = self._updated_frame(
+                    {column: updates[column].to_numpy() for column in PORTFOLIO_DTYPES if column != "id"}, positions)
+                self.stats.remove(self._frame.iloc[rows])
+                self.stats.add(frame.iloc[rows])
+                for old, new, cid in zip(self._frame["name"].iloc[rows], updates["name"], updates["id"]):
+                    self._names.pop(normalize_name(old), None)
+                    self._names[normalize_name(new)] = cid
+                self._frame = frame
+            if not known.all():
+                self._add_rows(changed[~known].reset_index(drop=True))
+        self._apply_approvals(approvals)
+        self._store_versions = versions
+        self.version += 1
+
+    def sync(self):
+        """Fold in what other processes have written to the store; returns True if anything changed"""
+        if self.store is None:
+            return False
+        versions = self.store.versions()
+        with self._lock:
+            changed = any(versions[name] != self._store_versions[name] for name in ("customers", "approvals"))
+            if changed:
+                self._sync()
+            self.store.check_in(self.uid, "customers", self._store_versions["customers"])
+            return changed
+
+    def append(self, customers):
+        """Add customers; raises ValueError on a duplicate ID or name"""
+        df = coerce_frame(customers)
+        ids = df["id"].tolist()
+        names = [normalize_name(name) for name in df["name"]]
+        with self._lock:
+            if len(set(ids)) != len(ids) or any(i in self._positions for i in ids):
+                raise ValueError("Duplicate customer ID in portfolio append")
+            if len(set(names)) != len(names) or any(n in self._names for n in names):
+                raise ValueError("Duplicate customer name in portfolio append")
+            if self.store is not None and not self._stored("customers", self.store.append_customers(df)):
+                self._sync()
+                return df
+
+            self._add_rows(df)
+            self.version += 1
+            return df
+
+    def has_name(self, name):
+        """True if a customer with this name (compared normalized, see identity.normalize_name) exists"""
+        return normalize_name(name) in self._names
+
+    def normalized_names(self):
+        return self._names.keys()
+
+    def get(self, customer_id):
+        """Return a single customer as a dict, or None"""
+        position = self._positions.get(customer_id)
+        if position is None:
+            return None
+        return self.records([position])[0]
+
+    def records(self, positions):
+        """Customers at the given row positions as plain dicts (for rendering)"""
+        rows = self.frame.iloc[list(positions)]
+        return [
+            {k: (v.item() if isinstance(v, np.generic) else v) for k, v in row.items()}
+            for row in rows.to_dict("records")
+        ]
+
+    def records_by_id(self, customer_ids):
+        """Customers with the given IDs as plain dicts, in the order given"""
+        return self.records([self._positions[cid] for cid in customer_ids])
+
+    def tail(self, n):
+        """The n most recently added customers, oldest first"""
+        return self.records(range(max(0, len(self) - n), len(self)))
+
+    def update_columns(self, columns, positions=None):
+        """Overwrite columns for the rows at positions (default: every customer)"""
+        with self._lock:
+            frame, rows = self._updated_frame(columns, positions)
+            if self.store is not None:
+                changed = frame.iloc[rows]
+                version = self.store.update_customers(changed["id"].tolist(),
+                                                      {column: changed[column] for column in columns})
+                if not self._stored("customers", version):
+                    self._sync()
+                    return
+            self.stats.remove(self._frame.iloc[rows])
+            self.stats.add(frame.iloc[rows])
+            self._frame = frame
+            self.version += 1
+
+    def rescore(self, market_data, market_context=None):
+        """Re-run the limit model over every customer against market_data
+
+        Only customers whose scores changed are rewritten, and only they take
+        ``market_context``, so it records the market their current scores
+        were set in. Returns the customers whose opportunity
+        changed, as a frame of id, name, old_opportunity and new_opportunity.
+        """
+        with self._lock:
+            frame = self.frame
+            scores = score_batch(frame, market_data)
+            old = frame["opportunity"]
+            changed = old.cat.codes.to_numpy() != scores["opportunity"].cat.codes.to_numpy()
+            diff = pd.DataFrame({
+                "id": frame["id"][changed],
+                "name": frame["name"][changed],
+                "old_opportunity": old[changed],
+                "new_opportunity": scores["opportunity"][changed],
+            }).reset_index(drop=True)
+
+            rescored = changed | (frame["recommended_limit"].to_numpy() != scores["recommended_limit"].to_numpy()) \
+                | (frame["rate_reduction"].to_numpy() != scores["rate_reduction"].to_numpy(dtype=np.float32))
+            positions = np.flatnonzero(rescored)
+            if len(positions):
+                columns = {
+                    "recommended_limit": scores["recommended_limit"].to_numpy()[positions],
+                    "rate_reduction": scores["rate_reduction"].to_numpy()[positions],
+                    "opportunity": scores["opportunity"].to_numpy()[positions],
+                }
+                if market_context is not None:
+                    columns["market_context"] = [market_context] * len(positions)
+                self.update_columns(columns, positions)
+            return diff
+
+    def remove(self, customer_ids):
+        """Delete customers by ID; unknown IDs are ignored"""
+        with self._lock:
+            drop = [self._positions[cid] for cid in customer_ids if cid in self._positions]
+            if not drop:
+                return 0
+            if self.store is not None and not self._stored(
+                    "customers", self.store.delete_customers(self.frame["id"].iloc[drop].tolist())):
+                self._sync()
+                return len(drop)
+            self._drop_rows(drop)
+            self.version += 1
+            return len(drop)
+
+    def clear(self):
+        """Delete every customer (the approval ledger keeps its history)"""
+        with self._lock:
+            if self.store is not None:
+                self._store_versions["customers"] = self.store.delete_customers()
+            self._frame = empty_frame()
+            self._pending = []
+            self._positions = {}
+            self._names = {}
+            self._approvals = {}
+            self.stats.clear()
+            self.version += 1
+
+    def approve_many(self, customer_ids, approved_by=None):
+        """Approve the current recommendation of every given customer in one transaction
+
+        Customers whose current recommendation is already approved, and
+        unknown IDs, are skipped. Returns the number of new approvals.
+        """
+        with self._lock:
+            positions = [self._positions[cid] for cid in dict.fromkeys(customer_ids) if cid in self._positions]
+            rows = self.frame.iloc[positions]
+            ids = rows["id"].tolist()
+            limits = rows["recommended_limit"].to_numpy()
+            revenue = (limits - rows["current_limit"].to_numpy()) * REVENUE_RATE
+            new = {}
+            for cid, limit, impact in zip(ids, limits.tolist(), revenue.tolist()):
+                key = approval_key(cid, limit)
+                if self._approvals.get(cid, (None,))[0] != key:
+                    new[cid] = (key, impact, limit)
+            if not new:
+                return 0
+            if self.store is not None:
+                inserted, version = self.store.record_approvals(
+                    [(key, cid, limit, impact) for cid, (key, impact, limit) in new.items()], approved_by)
+                # Check the count first: a short insert must not record the version, or _sync would skip it
+                if inserted != len(new) or not self._stored("approvals", version):
+                    self._sync()
+                    return inserted
+            self._apply_approvals({cid: (key, impact) for cid, (key, impact, _) in new.items()})
+            return len(new)
+
+    def approve(self, customer_id, approved_by=None):
+        """Approve one customer's current recommendation; False if it was already approved"""
+        return self.approve_many([customer_id], approved_by) > 0
+
+    def is_approved(self, customer_id):
+        """True if the customer's current recommendation has been approved"""
+        position = self._positions.get(customer_id)
+        entry = self._approvals.get(customer_id)
+        if position is None or entry is None:
+            return False
+        return entry[0] == approval_key(customer_id, self.frame["recommended_limit"].iat[position])
+
+    def _reserve_ids(self, count):
+        if self.store is not None:
+            return self.store.reserve_ids(count)
+        start = max(self._next_sequence, max(map(id_sequence, self._positions), default=0) + 1)
+        self._next_sequence = start + count
+        return start
+
+    def allocate_ids(self, count):
+        """``count`` new customer IDs, unique even across processes sharing a store"""
+        return self._ids.allocate(count)
+
+    def next_id(self):
+        return self.allocate_ids(1)[0]
+
+    def query(self, **filters):
+        """Positions of customers matching the filters (see query_positions)"""
+        return query_positions(self.frame, **filters)
+
+    def page(self, positions, page, page_size):
+        """Display frame for one page (1-based) of a query result"""
+        start = (page - 1) * page_size
+        return display_frame(self.frame.iloc[positions[start:start + page_size]])
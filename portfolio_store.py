@@ -0,0 +1,533 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from identity import name_key
+from portfolio import PORTFOLIO_DTYPES, coerce_frame, empty_frame
+
+CUSTOMER_COLUMNS = list(PORTFOLIO_DTYPES)
+
+# A reader that hasn't checked in for this long no longer holds back tombstone pruning
+READER_TIMEOUT = 3600
+# How often a reader re-records an unchanged version
+READER_CHECK_IN_INTERVAL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    current_limit INTEGER NOT NULL,
+    recommended_limit INTEGER NOT NULL,
+    utilization REAL NOT NULL,
+    payment_history INTEGER NOT NULL,
+    income INTEGER NOT NULL,
+    risk_score INTEGER NOT NULL,
+    months_since_increase INTEGER NOT NULL,
+    opportunity TEXT NOT NULL,
+    rate_reduction REAL NOT NULL,
+    spending_category TEXT NOT NULL,
+    category_spend INTEGER NOT NULL,
+    market_context TEXT NOT NULL,
+    added_by TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS id_sequences (
+    name TEXT PRIMARY KEY,
+    next_value INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_customers_name_key ON customers (name_key);
+-- Filtering happens on the in-memory frame, so only sync lookups are indexed; every other index
+-- would just slow down rescoring, which rewrites most rows
+DROP INDEX IF EXISTS idx_customers_opportunity;
+DROP INDEX IF EXISTS idx_customers_risk_score;
+DROP INDEX IF EXISTS idx_customers_added_by;
+CREATE INDEX IF NOT EXISTS idx_customers_version ON customers (version);
+INSERT OR IGNORE INTO id_sequences (name, next_value)
+    SELECT 'customers', COALESCE(MAX(CAST(SUBSTR(id, 2) AS INTEGER)), 0) + 1 FROM customers;
+
+-- Customers deleted one by one, so other processes can drop them without reloading. Pruned once every
+-- live reader has seen them, and emptied on clear
+CREATE TABLE IF NOT EXISTS deleted_customers (
+    id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_deleted_customers_version ON deleted_customers (version);
+
+-- Append-only approval ledger; re-approving the recommendation in a customer's latest entry is a no-op
+CREATE TABLE IF NOT EXISTS approvals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    approval_key TEXT NOT NULL,
+    customer_id TEXT NOT NULL,
+    recommended_limit INTEGER NOT NULL,
+    revenue_impact REAL NOT NULL,
+    approved_by TEXT,
+    approved_at REAL NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_approvals_customer_id ON approvals (customer_id);
+CREATE INDEX IF NOT EXISTS idx_approvals_version ON approvals (version);
+
+CREATE TABLE IF NOT EXISTS analyses (
+    customer_id TEXT PRIMARY KEY,
+    analysis TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_version ON analyses (version);
+
+CREATE TABLE IF NOT EXISTS deleted_analyses (
+    customer_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_deleted_analyses_version ON deleted_analyses (version);
+
+-- The version of each table group every process last checked in with, so tombstones they have all
+-- seen can be pruned
+CREATE TABLE IF NOT EXISTS readers (
+    reader TEXT NOT NULL,
+    name TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (reader, name)
+);
+
+-- One change counter per table group, bumped in the same transaction as every write; customer,
+-- approval and analysis rows carry the version that last wrote them. A reader holding a customers or
+-- analyses version below <name>_floor must reload: a delete-all or tombstone pruning happened since.
+CREATE TABLE IF NOT EXISTS store_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO store_versions (name, version)
+    VALUES ('customers', 0), ('customers_floor', 0), ('approvals', 0), ('analyses', 0), ('analyses_floor', 0);
+"""
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections shared by every thread in the process"""
+
+    def __init__(self, path, size=4, timeout=30.0):
+        self.path = path
+        self._pool = queue.Queue()
+        for _ in range(size):
+            conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._pool.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Connection inside a write transaction, committed on success and rolled back on error"""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    @contextmanager
+    def snapshot(self):
+        """Connection inside a read transaction, so every query sees the same committed state"""
+        with self.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            finally:
+                conn.rollback()
+
+
+def _current(conn, name):
+    return conn.execute("SELECT version FROM store_versions WHERE name = ?", (name,)).fetchone()[0]
+
+
+def _versions(conn):
+    return dict(conn.execute("SELECT name, version FROM store_versions").fetchall())
+
+
+def _bump(conn, name):
+    conn.execute("UPDATE store_versions SET version = version + 1 WHERE name = ?", (name,))
+    return _current(conn, name)
+
+
+def _raise_floor(conn, name, version):
+    conn.execute("UPDATE store_versions SET version = MAX(version, ?) WHERE name = ?", (version, f"{name}_floor"))
+
+
+def _prune_tombstones(conn, name, table):
+    """Drop tombstones that every live reader of ``name`` has already seen
+
+    Readers that haven't checked in within READER_TIMEOUT are forgotten; if
+    one comes back below the pruned versions, the raised floor makes it
+    reload instead of missing a delete.
+    """
+    conn.execute("DELETE FROM readers WHERE seen_at <= ?", (time.time() - READER_TIMEOUT,))
+    oldest = conn.execute("SELECT MIN(version) FROM readers WHERE name = ?", (name,)).fetchone()[0]
+    if oldest is not None and conn.execute(f"DELETE FROM {table} WHERE version <= ?", (oldest,)).rowcount:
+        _raise_floor(conn, name, oldest)
+
+
+def _sql_values(values):
+    """Column values as plain Python objects SQLite accepts"""
+    series = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime("%Y-%m-%d %H:%M:%S.%f").tolist()
+    if isinstance(series.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(series):
+        return series.astype(object).tolist()
+    return series.tolist()
+
+
+def _customer_frame(rows):
+    """Customer rows read from SQLite as a typed portfolio frame"""
+    if not rows:
+        return empty_frame()
+    frame = pd.DataFrame(rows, columns=CUSTOMER_COLUMNS)
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"])
+    return coerce_frame(frame)
+
+
+def _latest_approvals(conn, since=0):
+    """{customer_id: (approval_key, revenue)} from each customer's latest ledger entry written after ``since``"""
+    # +customer_id keeps SQLite on the version index rather than walking the whole ledger in customer order
+    rows = conn.execute(
+        "SELECT a.customer_id, a.approval_key, a.revenue_impact FROM approvals a "
+        "JOIN (SELECT customer_id, MAX(id) AS id FROM approvals WHERE version > ? GROUP BY +customer_id) latest "
+        "ON latest.id = a.id",
+        (since,),
+    ).fetchall()
+    return {cid: (key, revenue) for cid, key, revenue in rows}
+
+
+class SQLitePortfolioStore:
+    """Portfolio customers, approvals and AI analyses in one SQLite database
+
+    Every write bumps a per-table-group version in the same transaction, so
+    processes sharing the database can tell cheaply (``versions()``) when
+    their in-memory copy is stale, and fetch only what changed since
+    (``changes()``). Write methods return the new version.
+    """
+
+    def __init__(self, path, pool_size=4):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.pool = ConnectionPool(path, size=pool_size)
+        with self.pool.connection() as conn:
+            conn.executescript(SCHEMA)
+        self._check_ins = {}
+
+    def versions(self):
+        with self.pool.connection() as conn:
+            return _versions(conn)
+
+    def check_in(self, reader, name, version):
+        """Record the ``name`` version a reader holds, at most once per READER_CHECK_IN_INTERVAL if unchanged
+
+        Tombstones above the oldest version held by a live reader are kept.
+        """
+        now = time.time()
+        last = self._check_ins.get((reader, name))
+        if last is not None and last[0] == version and now - last[1] < READER_CHECK_IN_INTERVAL:
+            return
+        with self.pool.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO readers (reader, name, version, seen_at) VALUES (?, ?, ?, ?)",
+                         (reader, name, version, now))
+        self._check_ins[(reader, name)] = (version, now)
+
+    def load(self):
+        """Every customer and the latest approval of each, read together
+
+        Returns (customers frame in insertion order, {customer_id:
+        (approval_key, revenue)}, versions).
+        """
+        with self.pool.snapshot() as conn:
+            rows = conn.execute(f"SELECT {', '.join(CUSTOMER_COLUMNS)} FROM customers ORDER BY rowid").fetchall()
+            return _customer_frame(rows), _latest_approvals(conn), _versions(conn)
+
+    def changes(self, since, max_rows=None):
+        """What was written after the versions in ``since`` ({"customers": v, "approvals": v}), read together
+
+        Returns (customers inserted or updated, IDs of customers deleted,
+        {customer_id: (approval_key, revenue)} of newer approvals, versions).
+        The customers frame is None if every customer was deleted since, or
+        more than ``max_rows`` were written, in which case the caller should
+        ``load()`` instead.
+        """
+        with self.pool.snapshot() as conn:
+            versions = _versions(conn)
+            if versions["customers_floor"] > since["customers"]:
+                return None, [], {}, versions
+            if max_rows is not None and conn.execute(
+                    "SELECT COUNT(*) FROM customers WHERE version > ?", (since["customers"],)).fetchone()[0] > max_rows:
+                return None, [], {}, versions
+            # Ordered so the version index is used; within a version, rows come in insertion order
+            rows = conn.execute(f"SELECT {', '.join(CUSTOMER_COLUMNS)} FROM customers WHERE version > ? "
+                                "ORDER BY version, rowid", (since["customers"],)).fetchall()
+            deleted = [cid for cid, in conn.execute("SELECT id FROM deleted_customers WHERE version > ?",
+                                                    (since["customers"],))]
+            return _customer_frame(rows), deleted, _latest_approvals(conn, since["approvals"]), versions
+
+    # ----------------------------- customers -----------------------------
+
+    def reserve_ids(self, count):
+        """Reserve ``count`` consecutive customer ID sequence numbers; returns the first"""
+        with self.pool.transaction() as conn:
+            start = conn.execute("SELECT next_value FROM id_sequences WHERE name = 'customers'").fetchone()[0]
+            conn.execute("UPDATE id_sequences SET next_value = ? WHERE name = 'customers'", (start + count,))
+            return start
+
+    def append_customers(self, frame):
+        """Insert customers; raises ValueError if an ID or normalized name already exists or a value is missing"""
+        columns = CUSTOMER_COLUMNS + ["name_key", "version"]
+        values = [_sql_values(frame[column]) for column in CUSTOMER_COLUMNS]
+        values.append([name_key(name) for name in frame["name"]])
+        placeholders = ", ".join("?" for _ in columns)
+        try:
+            with self.pool.transaction() as conn:
+                version = _bump(conn, "customers")
+                conn.executemany(f"INSERT INTO customers ({', '.join(columns)}) VALUES ({placeholders})",
+                                 (row + (version,) for row in zip(*values)))
+                return version
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"Could not store customers: {e}")
+
+    def update_customers(self, customer_ids, columns):
+        """Overwrite columns ({column: values aligned with customer_ids}) for the given customers"""
+        names = list(columns)
+        values = [_sql_values(columns[name]) for name in names]
+        if "name" in columns:
+            names.append("name_key")
+            values.append([name_key(name) for name in values[names.index("name")]])
+        assignments = ", ".join(f"{name} = ?" for name in names + ["version"])
+        with self.pool.transaction() as conn:
+            version = _bump(conn, "customers")
+            if names and len(customer_ids):
+                conn.executemany(f"UPDATE customers SET {assignments} WHERE id = ?",
+                                 zip(*values, [version] * len(customer_ids), list(customer_ids)))
+            return version
+
+    def delete_customers(self, customer_ids=None):
+        """Delete the given customers (default: all) and their analyses
+
+        Deleting every customer raises the customers and analyses floors
+        instead of leaving a tombstone per customer.
+        """
+        with self.pool.transaction() as conn:
+            version = _bump(conn, "customers")
+            if customer_ids is None:
+                conn.execute("DELETE FROM customers")
+                conn.execute("DELETE FROM deleted_customers")
+                _raise_floor(conn, "customers", version)
+            else:
+                conn.executemany("DELETE FROM customers WHERE id = ?", [(cid,) for cid in customer_ids])
+                conn.executemany("INSERT OR REPLACE INTO deleted_customers (id, version) VALUES (?, ?)",
+                                 [(cid, version) for cid in customer_ids])
+                _prune_tombstones(conn, "customers", "deleted_customers")
+            self._delete_analyses(conn, customer_ids)
+            return version
+
+    # ----------------------------- approvals -----------------------------
+    def record_approvals(self, approvals, approved_by=None):
+        """Append (approval_key, customer_id, recommended_limit, revenue_impact) entries in one transaction
+
+        An entry whose key matches the customer's latest ledger entry is
+        ignored, so only re-approving the current approval is a no-op; a
+        limit approved earlier and superseded can be approved again.
+        Returns (entries inserted, version).
+        """
+        now = time.time()
+        with self.pool.transaction() as conn:
+            version = _bump(conn, "approvals")
+            latest = {}
+            rows = []
+            for key, cid, limit, revenue in approvals:
+                if cid not in latest:
+                    row = conn.execute("SELECT approval_key FROM approvals WHERE customer_id = ? "
+                                       "ORDER BY id DESC LIMIT 1", (cid,)).fetchone()
+                    latest[cid] = row[0] if row else None
+                if latest[cid] == key:
+                    continue
+                latest[cid] = key
+                rows.append((key, cid, int(limit), float(revenue), approved_by, now, version))
+            conn.executemany(
+                "INSERT INTO approvals "
+                "(approval_key, customer_id, recommended_limit, revenue_impact, approved_by, approved_at, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            return len(rows), version
+
+    def approval_ledger(self, limit=None):
+        """Ledger entries, newest first"""
+        query = ("SELECT approval_key, customer_id, recommended_limit, revenue_impact, approved_by, approved_at "
+                 "FROM approvals ORDER BY id DESC")
+        params = []
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        with self.pool.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        ledger = pd.DataFrame(rows, columns=["approval_key", "customer_id", "recommended_limit", "revenue_impact",
+                                             "approved_by", "approved_at"])
+        ledger["approved_at"] = pd.to_datetime([datetime.fromtimestamp(t) for t in ledger["approved_at"]])
+        return ledger
+
+    # ----------------------------- analyses -----------------------------
+    def load_analyses(self):
+        with self.pool.snapshot() as conn:
+            rows = conn.execute("SELECT customer_id, analysis FROM analyses").fetchall()
+            return dict(rows), _current(conn, "analyses")
+
+    def analysis_changes(self, since):
+        """Analyses written and deleted after version ``since``: ({customer_id: analysis}, deleted IDs, version)
+
+        The analyses are None if the caller is below the analyses floor and
+        should ``load_analyses()`` instead.
+        """
+        with self.pool.snapshot() as conn:
+            version = _current(conn, "analyses")
+            if _current(conn, "analyses_floor") > since:
+                return None, [], version
+            rows = conn.execute("SELECT customer_id, analysis FROM analyses WHERE version > ?", (since,)).fetchall()
+            deleted = [cid for cid, in conn.execute("SELECT customer_id FROM deleted_analyses WHERE version > ?",
+                                                    (since,))]
+            return dict(rows), deleted, version
+
+    def save_analyses(self, analyses):
+        """Insert or replace {customer_id: analysis text}"""
+        now = time.time()
+        with self.pool.transaction() as conn:
+            version = _bump(conn, "analyses")
+            conn.executemany("INSERT OR REPLACE INTO analyses (customer_id, analysis, created_at, version) "
+                             "VALUES (?, ?, ?, ?)", [(cid, text, now, version) for cid, text in analyses.items()])
+            return version
+
+    def delete_analyses(self, customer_ids=None):
+        with self.pool.transaction() as conn:
+            return self._delete_analyses(conn, customer_ids)
+
+    def _delete_analyses(self, conn, customer_ids=None):
+        version = _bump(conn, "analyses")
+        if customer_ids is None:
+            conn.execute("DELETE FROM analyses")
+            conn.execute("DELETE FROM deleted_analyses")
+            _raise_floor(conn, "analyses", version)
+        else:
+            conn.executemany("DELETE FROM analyses WHERE customer_id = ?", [(cid,) for cid in customer_ids])
+            conn.executemany("INSERT OR REPLACE INTO deleted_analyses (customer_id, version) VALUES (?, ?)",
+                             [(cid, version) for cid in customer_ids])
+            _prune_tombstones(conn, "analyses", "deleted_analyses")
+        return version
+
+
+STORES = {
+    "sqlite": SQLitePortfolioStore,
+}
+
+
+def get_store(name, **options):
+    """Instantiate a portfolio store backend by its configured name"""
+    try:
+        return STORES[name.lower()](**options)
+    except KeyError:
+        raise ValueError(f"Unknown portfolio store: {name}")
+
+
+class StoredAnalyses(MutableMapping):
+    """AI analyses by customer ID, written through to a portfolio store
+
+    Reads come from memory; ``sync()`` fetches only the analyses another
+    process has written or deleted since. Safe to update from background
+    threads.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.uid = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._data, self._version = store.load_analyses()
+        store.check_in(self.uid, "analyses", self._version)
+
+    @property
+    def version(self):
+        """Store version of the analyses held; changes with every write, here or in another process"""
+        return self._version
+
+    def _patch(self):
+        """Fold in every analysis written or deleted in the store since the version held"""
+        changed, deleted, version = self.store.analysis_changes(self._version)
+        if changed is None:
+            self._data, version = self.store.load_analyses()
+        else:
+            self._data.update(changed)
+            for customer_id in deleted:
+                self._data.pop(customer_id, None)
+        self._version = version
+
+    def sync(self):
+        if self.store.versions()["analyses"] != self._version:
+            with self._lock:
+                self._patch()
+        self.store.check_in(self.uid, "analyses", self._version)
+
+    def _wrote(self, version):
+        if version == self._version + 1:
+            self._version = version
+        else:
+            # Someone else wrote in between: fetch their changes (and ours, again) so memory matches the store
+            self._patch()
+
+    def __getitem__(self, customer_id):
+        return self._data[customer_id]
+
+    def __setitem__(self, customer_id, analysis):
+        self.update({customer_id: analysis})
+
+    def __delitem__(self, customer_id):
+        with self._lock:
+            if customer_id not in self._data:
+                raise KeyError(customer_id)
+            del self._data[customer_id]
+            self._wrote(self.store.delete_analyses([customer_id]))
+
+    def __iter__(self):
+        return iter(list(self._data))
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, customer_id):
+        return customer_id in self._data
+
+    def update(self, analyses=(), **kwargs):
+        analyses = dict(analyses, **kwargs)
+        if not analyses:
+            return
+        with self._lock:
+            self._data.update(analyses)
+            self._wrote(self.store.save_analyses(analyses))
+
+    def clear(self):
+        with self._lock:
+            self._data = {}
+            self._wrote(self.store.delete_analyses())
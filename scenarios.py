@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from scoring import (HIGH_OPPORTUNITY_INCREASE, MEDIUM_OPPORTUNITY_INCREASE, REVENUE_RATE, base_limit,
+                     market_factor)
+
+# VIX above this level cuts recommended limits by VIX_SENSITIVITY per point, down to VIX_FLOOR_FACTOR
+VIX_BASELINE = 20.0
+VIX_SENSITIVITY = 0.01
+VIX_FLOOR_FACTOR = 0.7
+
+# Share of a treasury rate move (percentage points) that comes off the annual revenue rate via funding cost
+RATE_FUNDING_SENSITIVITY = 0.5
+
+# Upper bound on scenario x customer cells evaluated at once (about 8 bytes each per array)
+MAX_CELLS = 4_000_000
+
+SCENARIO_COLUMNS = [
+    "sp500_change", "vix_level", "rate_change", "limit_factor", "revenue_rate",
+    "total_recommended", "limit_increase", "drawn_exposure", "revenue_impact",
+    "high", "medium", "low",
+]
+
+
+def vix_factor(vix_level):
+    """Limit multiplier for a VIX level (scalar or array): 1.0 up to the baseline, lower as volatility rises"""
+    vix = np.asarray(vix_level, dtype=float)
+    factor = np.clip(1 - np.maximum(0, vix - VIX_BASELINE) * VIX_SENSITIVITY, VIX_FLOOR_FACTOR, 1.0)
+    return factor if factor.ndim else float(factor)
+
+
+def scenario_grid(sp500_changes, vix_levels, rate_changes=(0.0,)):
+    """Every combination of S&P 500 daily changes (%), VIX levels and treasury rate moves (pp)"""
+    sp500, vix, rate = np.meshgrid(np.asarray(sp500_changes, dtype=float), np.asarray(vix_levels, dtype=float),
+                                   np.asarray(rate_changes, dtype=float), indexing="ij")
+    return pd.DataFrame({"sp500_change": sp500.ravel(), "vix_level": vix.ravel(), "rate_change": rate.ravel()})
+
+
+def run_scenarios(df, scenarios, max_cells=MAX_CELLS):
+    """Evaluate the limit model for every customer under every scenario
+
+    ``df`` is a portfolio frame and ``scenarios`` a frame with sp500_change,
+    vix_level and rate_change columns (see ``scenario_grid``). Limits are
+    computed as a (scenario x customer) broadcast, in chunks of scenarios
+    bounded by ``max_cells``; scenarios sharing a limit factor are computed
+    once. Returns one row per scenario with exposure and revenue impact.
+    Raises ValueError if a single scenario over every customer would
+    already exceed ``max_cells``.
+    """
+    if len(df) > max_cells:
+        raise ValueError(f"{len(df):,} customers exceed the {max_cells:,}-cell scenario limit")
+    scenarios = scenarios.reset_index(drop=True)
+    limit_factors = market_factor(scenarios["sp500_change"].to_numpy()) * vix_factor(scenarios["vix_level"].to_numpy())
+    revenue_rates = np.maximum(0, REVENUE_RATE - RATE_FUNDING_SENSITIVITY * scenarios["rate_change"].to_numpy() / 100)
+
+    base = base_limit(df)
+    current = df["current_limit"].to_numpy(dtype=float)
+    utilization = df["utilization"].to_numpy(dtype=float)
+
+    unique_factors, inverse = np.unique(limit_factors, return_inverse=True)
+    totals = np.zeros(len(unique_factors))
+    drawn = np.zeros(len(unique_factors))
+    tiers = np.zeros((len(unique_factors), 3), dtype=np.int64)
+    step = max_cells // max(1, len(df))
+    for start in range(0, len(unique_factors), step):
+        factors = unique_factors[start:start + step, None]
+        # Whole-rupee limits held in float64, exact well beyond any portfolio total
+        recommended = np.maximum(current, np.floor(base * factors))
+        totals[start:start + step] = recommended.sum(axis=1)
+        drawn[start:start + step] = recommended @ utilization
+        increase = (recommended - current) / current
+        high = (increase > HIGH_OPPORTUNITY_INCREASE).sum(axis=1)
+        medium = (increase > MEDIUM_OPPORTUNITY_INCREASE).sum(axis=1) - high
+        tiers[start:start + step] = np.column_stack([high, medium, len(df) - high - medium])
+
+    total_recommended = totals[inverse].astype(np.int64)
+    limit_increase = total_recommended - int(current.sum())
+    results = scenarios[["sp500_change", "vix_level", "rate_change"]].copy()
+    results["limit_factor"] = limit_factors
+    results["revenue_rate"] = revenue_rates
+    results["total_recommended"] = total_recommended
+    results["limit_increase"] = limit_increase
+    results["drawn_exposure"] = drawn[inverse]
+    results["revenue_impact"] = limit_increase * revenue_rates
+    results["high"], results["medium"], results["low"] = tiers[inverse].T
+    return results[SCENARIO_COLUMNS]
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+USD_TO_INR = 83  # 1 USD = 83 INR (update as needed)
+
+REVENUE_RATE = 0.15  # Annual revenue earned per ₹ of additional limit
+OPPORTUNITY_LEVELS = ["Low", "Medium", "High"]
+HIGH_OPPORTUNITY_INCREASE = 0.3  # Limit increase fraction above which an opportunity is High
+MEDIUM_OPPORTUNITY_INCREASE = 0.1  # ... and above which it is Medium
+
+SCORING_INPUTS = [
+    "current_limit", "utilization", "payment_history",
+    "income", "risk_score", "months_since_increase"
+]
+
+
+def market_factor(sp500_change):
+    """Limit multiplier for the given S&P 500 daily change (scalar or array)"""
+    change = np.asarray(sp500_change, dtype=float)
+    factor = np.where(change > 1, 1.1, np.where(change < -1, 0.9, 1.0))
+    return factor if factor.ndim else float(factor)
+
+
+def base_limit(df):
+    """Recommended limit before the market factor is applied (float array)
+
+    Expects portfolio units: current_limit and income in INR, utilization as a
+    0-1 fraction.
+    """
+    utilization = df["utilization"].to_numpy(dtype=float)
+    income_usd = df["income"].to_numpy(dtype=float) / USD_TO_INR
+    risk_score = df["risk_score"].to_numpy(dtype=float)
+    months = df["months_since_increase"].to_numpy(dtype=float)
+
+    utilization_factor = np.where(utilization > 0.7, np.maximum(0.5, 1 - utilization), 1.2)
+    income_factor = np.minimum(2.0, income_usd / 50000)
+    risk_factor = np.maximum(0.3, (risk_score - 300) / 550)
+    time_factor = np.minimum(1.3, 1 + months / 60)
+
+    current_limit = df["current_limit"].to_numpy(dtype=float)
+    return current_limit * utilization_factor * income_factor * risk_factor * time_factor
+
+
+def opportunity_tier(increase_percentage):
+    """Map limit increase fractions to High / Medium / Low opportunity labels"""
+    increase = np.asarray(increase_percentage, dtype=float)
+    return np.select([increase > HIGH_OPPORTUNITY_INCREASE, increase > MEDIUM_OPPORTUNITY_INCREASE],
+                     ["High", "Medium"], default="Low")
+
+
+def score_batch(df, market_data):
+    """Score every row of a customer frame in one vectorized pass
+
+    Returns a frame aligned to ``df.index`` with recommended_limit,
+    rate_reduction, opportunity, increase_percentage and revenue_impact.
+    """
+    missing = [c for c in SCORING_INPUTS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing scoring columns: {', '.join(missing)}")
+
+    current_limit = df["current_limit"].to_numpy(dtype=np.int64)
+    recommended = np.floor(base_limit(df) * market_factor(market_data['sp500_change'])).astype(np.int64)
+    recommended = np.maximum(current_limit, recommended)
+
+    payment_history = df["payment_history"].to_numpy(dtype=float)
+    risk_score = df["risk_score"].to_numpy(dtype=float)
+    rate_reduction = np.maximum(0, (payment_history - 80) * 0.05 + (risk_score - 600) * 0.01)
+
+    increase_percentage = (recommended - current_limit) / current_limit
+
+    return pd.DataFrame({
+        "recommended_limit": recommended,
+        "rate_reduction": rate_reduction,
+        "opportunity": pd.Categorical(opportunity_tier(increase_percentage), categories=OPPORTUNITY_LEVELS),
+        "increase_percentage": increase_percentage,
+        "revenue_impact": (recommended - current_limit) * REVENUE_RATE,
+    }, index=df.index)
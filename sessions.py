@@ -0,0 +1,102 @@
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from config import DEFAULT_SECRET_KEY
+
+# Cookie carrying the signed session token, so a page reload resumes the session
+SESSION_COOKIE = "cie_session"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    user_info TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at);
+"""
+
+
+def sign_token(secret, session_id, expires_at):
+    """Session token: "<session id>.<expiry>.<HMAC-SHA256 of both>" """
+    payload = f"{session_id}.{int(expires_at)}"
+    signature = hmac.new(secret.encode("utf-8"), payload.encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"{payload}.{signature}"
+
+
+def verify_token(secret, token, now=None):
+    """Session ID from a token with a valid signature that hasn't expired, else None"""
+    try:
+        session_id, expires_at, _ = str(token).split(".")
+        expires_at = int(expires_at)
+    except ValueError:
+        return None
+    if not hmac.compare_digest(sign_token(secret, session_id, expires_at), str(token)):
+        return None
+    if expires_at <= (time.time() if now is None else now):
+        return None
+    return session_id
+
+
+class SessionStore:
+    """Server-side login sessions behind signed, expiring tokens
+
+    The token only names a session and its expiry; the user profile stays
+    in SQLite, so revoking a session (logout) takes effect in every process
+    even while the token's signature is still valid. Tokens are checked
+    before the database is touched, so forged or expired ones cost nothing.
+    """
+
+    def __init__(self, path, secret, ttl=24 * 3600):
+        if not secret or secret == DEFAULT_SECRET_KEY:
+            raise ValueError("Session tokens need a private SECRET_KEY; the placeholder would let anyone forge them")
+        self.path = path
+        self.secret = secret
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def create(self, user_info):
+        """Store a new session; returns (token, expires_at)"""
+        now = time.time()
+        session_id = secrets.token_urlsafe(24)
+        expires_at = int(now + self.ttl)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "INSERT INTO sessions (session_id, user_info, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (session_id, json.dumps(user_info), now, expires_at),
+            )
+        return sign_token(self.secret, session_id, expires_at), expires_at
+
+    def resume(self, token):
+        """Session for a token as a dict (user_info, created_at, expires_at), or None"""
+        session_id = verify_token(self.secret, token)
+        if session_id is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT user_info, created_at, expires_at FROM sessions WHERE session_id = ? AND expires_at > ?",
+                (session_id, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"user_info": json.loads(row[0]), "created_at": row[1], "expires_at": row[2]}
+
+    def revoke(self, token):
+        session_id = verify_token(self.secret, token)
+        if session_id is None:
+            return
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
@@ -0,0 +1,130 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scoring import REVENUE_RATE
+
+# Customers are simulated in buckets of similar risk and utilization
+RISK_BAND_EDGES = [300, 580, 670, 740, 800, 851]
+UTILIZATION_BAND_EDGES = [0.0, 0.3, 0.5, 0.7, 0.9, 1.0001]
+
+# Annual default probability at risk score 700, scaled by exp((700 - score) / DEFAULT_RATE_SCALE)
+BASE_DEFAULT_RATE = 0.02
+DEFAULT_RATE_SCALE = 80
+LOSS_GIVEN_DEFAULT = 0.85
+UTILIZATION_VOLATILITY = 0.08  # Monthly log-normal utilization shock per bucket
+MIN_UTILIZATION = 0.01
+
+PERCENTILES = (5, 25, 50, 75, 95)
+BLOCK_PATHS = 1000  # Paths per independently seeded block, so results don't depend on worker count
+
+
+def annual_default_rate(risk_score):
+    """Annual default probability for a risk score (scalar or array)"""
+    rate = BASE_DEFAULT_RATE * np.exp((700 - np.asarray(risk_score, dtype=float)) / DEFAULT_RATE_SCALE)
+    return np.clip(rate, 0.001, 0.5)
+
+
+def bucket_portfolio(df):
+    """Group customers by risk band and utilization band for simulation
+
+    Returns one row per non-empty bucket with the customer count, the total
+    recommended limit increase, mean utilization and monthly default rate.
+    """
+    increase = (df["recommended_limit"].to_numpy(dtype=float) - df["current_limit"].to_numpy(dtype=float))
+    utilization = df["utilization"].to_numpy(dtype=float)
+    risk_score = df["risk_score"].to_numpy(dtype=float)
+    grouped = pd.DataFrame({
+        "risk_band": pd.cut(risk_score, RISK_BAND_EDGES, right=False),
+        "utilization_band": pd.cut(utilization, UTILIZATION_BAND_EDGES, right=False),
+        "customers": 1,
+        "limit_increase": increase,
+        "utilization": utilization,
+        "default_rate": 1 - (1 - annual_default_rate(risk_score)) ** (1 / 12),
+    }).groupby(["risk_band", "utilization_band"], observed=True)
+    buckets = grouped.agg(customers=("customers", "sum"), limit_increase=("limit_increase", "sum"),
+                          utilization=("utilization", "mean"), default_rate=("default_rate", "mean"))
+    return buckets.reset_index()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(workers):
+    """Process-wide simulation pool, replaced only if the worker count changes
+
+    Workers start from a forkserver (spawn where that is unavailable): forking
+    the multi-threaded app server directly can leave a child stuck on a lock
+    another thread held at the time of the fork.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None or _executor._max_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+        return _executor
+
+
+def _simulate_block(args):
+    counts, increase, utilization, default_rate, horizon, paths, seed = args
+    rng = np.random.default_rng(seed)
+    alive = np.broadcast_to(counts, (paths, len(counts))).copy()
+    start = np.maximum(utilization, MIN_UTILIZATION)
+    util = np.broadcast_to(start, alive.shape).copy()
+    monthly_revenue = increase * REVENUE_RATE / 12
+    cumulative = np.zeros(alive.shape)
+    totals = np.empty((paths, horizon))
+    for month in range(horizon):
+        defaults = rng.binomial(alive, default_rate)
+        alive -= defaults
+        util *= np.exp(rng.normal(-UTILIZATION_VOLATILITY ** 2 / 2, UTILIZATION_VOLATILITY, util.shape))
+        np.clip(util, MIN_UTILIZATION, 1.0, out=util)
+        revenue = monthly_revenue * (alive / counts) * (util / start)
+        losses = increase * (defaults / counts) * util * LOSS_GIVEN_DEFAULT
+        cumulative += revenue - losses
+        totals[:, month] = cumulative.sum(axis=1)
+    return totals, cumulative.sum(axis=0)
+
+
+def simulate_revenue(buckets, horizon=6, paths=10000, seed=None, workers=1, percentiles=PERCENTILES):
+    """Monte Carlo projection of cumulative revenue from recommended limit increases
+
+    Each path draws monthly defaults per bucket (binomial on surviving
+    customers) and a log-normal utilization shock per bucket; revenue scales
+    with surviving customers and utilization, and defaults lose the drawn
+    part of the increase. Paths run in blocks seeded from one SeedSequence,
+    so a given seed gives the same result for any number of ``workers``
+    (processes, from a pool shared across calls). Returns (bands, per_bucket): cumulative revenue percentiles
+    and mean per month, and the mean horizon revenue per bucket and customer.
+    """
+    counts = buckets["customers"].to_numpy(dtype=np.int64)
+    increase = buckets["limit_increase"].to_numpy(dtype=float)
+    utilization = buckets["utilization"].to_numpy(dtype=float)
+    default_rate = buckets["default_rate"].to_numpy(dtype=float)
+
+    sizes = [min(BLOCK_PATHS, paths - start) for start in range(0, paths, BLOCK_PATHS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    blocks = [(counts, increase, utilization, default_rate, horizon, size, child)
+              for size, child in zip(sizes, seeds)]
+    if workers > 1 and len(blocks) > 1:
+        results = list(get_executor(workers).map(_simulate_block, blocks))
+    else:
+        results = [_simulate_block(block) for block in blocks]
+
+    totals = np.concatenate([r[0] for r in results])
+    bucket_revenue = sum(r[1] for r in results) / paths
+    bands = pd.DataFrame(np.percentile(totals, percentiles, axis=0).T,
+                         columns=[f"p{p}" for p in percentiles],
+                         index=pd.RangeIndex(1, horizon + 1, name="month"))
+    bands["mean"] = totals.mean(axis=0)
+
+    per_bucket = buckets.copy()
+    per_bucket["projected_revenue"] = bucket_revenue
+    per_bucket["revenue_per_customer"] = bucket_revenue / counts
+    return bands, per_bucket
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from analysis import (BATCH_SECTIONS, batch_preamble, batch_profile_line, estimate_tokens, parse_batch_response,
+                      plan_batches)
+
+MARKET = {"sp500_change": 0.4, "vix_level": 18.0}
+
+
+def customer(n):
+    return {
+        "id": f"C{n:06d}",
+        "name": f"Customer {n}",
+        "current_limit": 415000,
+        "utilization": 0.35,
+        "income": 8300000,
+        "risk_score": 720,
+        "payment_history": 96,
+        "spending_category": "Travel",
+        "market_context": "Normal",
+    }
+
+
+def entry(customer_id, text="ok"):
+    return {"id": customer_id, **{field: f"{field} {text}" for field, _ in BATCH_SECTIONS}}
+
+
+def test_batches_split_on_output_budget():
+    customers = [customer(n) for n in range(1, 11)]
+    batches = plan_batches(customers, MARKET, max_output_tokens=400, output_tokens_per_customer=100)
+    assert [ids for _, ids, _ in batches] == [[c["id"] for c in customers[i:i + 4]] for i in (0, 4, 8)]
+    assert [max_tokens for _, _, max_tokens in batches] == [400, 400, 200]
+    assert all(prompt.startswith(batch_preamble(MARKET)) for prompt, _, _ in batches)
+
+
+def test_batches_split_on_prompt_budget():
+    customers = [customer(n) for n in range(1, 7)]
+    budget = estimate_tokens(batch_preamble(MARKET)) + 2 * estimate_tokens(batch_profile_line(customers[0])) + 1
+    batches = plan_batches(customers, MARKET, max_prompt_tokens=budget)
+    assert [len(ids) for _, ids, _ in batches] == [2, 2, 2]
+
+
+def test_oversized_customer_still_gets_its_own_batch():
+    batches = plan_batches([customer(1), customer(2)], MARKET, max_prompt_tokens=1)
+    assert [ids for _, ids, _ in batches] == [["C000001"], ["C000002"]]
+
+
+def test_parse_formats_every_section():
+    analyses = parse_batch_response(json.dumps({"analyses": [entry("C000001")]}), ["C000001"])
+    text = analyses["C000001"]
+    for n, (field, title) in enumerate(BATCH_SECTIONS, start=1):
+        assert f"{n}. {title}:\n{field} ok" in text
+
+
+def test_parse_matches_reordered_ids_and_drops_missing_or_unknown():
+    reply = json.dumps({"analyses": [entry("C000003", "three"), entry("C999999"), entry("C000001", "one")]})
+    analyses = parse_batch_response(reply, ["C000001", "C000002", "C000003"])
+    assert set(analyses) == {"C000001", "C000003"}
+    assert "one" in analyses["C000001"] and "three" in analyses["C000003"]
+
+
+def test_parse_finds_json_wrapped_in_prose_and_accepts_a_bare_list():
+    reply = "Here you go:\n```json\n" + json.dumps({"analyses": [entry("C000001")]}) + "\n```"
+    assert set(parse_batch_response(reply, ["C000001"])) == {"C000001"}
+    assert set(parse_batch_response(json.dumps([entry("C000001")]), ["C000001"])) == {"C000001"}
+
+
+@pytest.mark.parametrize("reply", ["", "not json", "{\"analyses\": [", "{\"analyses\": \"none\"}", "[1, 2]",
+                                   "{\"analyses\": [{\"name\": \"no id\"}]}"])
+def test_malformed_response_parses_to_nothing(reply):
+    assert parse_batch_response(reply, ["C000001"]) == {}
@@ -0,0 +1,69 @@
+import pytest
+
+import analysis_cache
+from analysis_cache import AnalysisCache, cache_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(analysis_cache.time, "time", clock)
+    return clock
+
+
+def make_cache(tmp_path, **limits):
+    return AnalysisCache(str(tmp_path / "analysis_cache.db"), **limits)
+
+
+def test_key_covers_prompt_model_and_params():
+    key = cache_key("prompt", "model", temperature=0.7)
+    assert key == cache_key("prompt", "model", temperature=0.7)
+    assert key != cache_key("prompt", "model", temperature=0.2)
+    assert key != cache_key("prompt", "other-model", temperature=0.7)
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.put("a", "m", "first")
+    clock.now += 1
+    cache.put("b", "m", "second")
+    clock.now += 1
+    assert cache.get("a") == "first"
+    clock.now += 1
+    cache.put("c", "m", "third")
+    assert cache.get("b") is None
+    assert cache.get("a") == "first"
+    assert cache.get("c") == "third"
+    assert cache.stats()["entries"] == 2
+
+
+def test_max_bytes_evicts_until_under_the_limit(tmp_path, clock):
+    cache = make_cache(tmp_path, max_bytes=25)
+    for key in "abc":
+        cache.put(key, "m", key * 10)
+        clock.now += 1
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"]) == (2, 20)
+    assert cache.get("a") is None
+    # An entry bigger than the limit on its own doesn't survive either
+    cache.put("d", "m", "d" * 30)
+    assert cache.stats() == {"entries": 0, "bytes": 0, "hits": 0, "misses": 1}
+
+
+def test_expired_entries_are_misses_and_dropped(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl=60)
+    cache.put("a", "m", "answer")
+    clock.now += 60
+    assert cache.get("a") == "answer"
+    clock.now += 1
+    assert cache.get("a") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.stats()["entries"] == 0
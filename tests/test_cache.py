@@ -0,0 +1,114 @@
+import pytest
+
+import cache as cache_module
+from cache import CacheNamespace, CacheRegistry
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def evicted():
+    return []
+
+
+def make_cache(evicted, **kwargs):
+    cache = CacheNamespace("test", **kwargs)
+    cache.on_evict = lambda key, value: evicted.append((key, value))
+    return cache
+
+
+def test_prefix_invalidation_drops_only_matching_keys(evicted):
+    cache = make_cache(evicted)
+    cache.set(("portfolio", 1, "csv"), "a")
+    cache.set(("portfolio", 1, "xlsx"), "b")
+    cache.set(("portfolio", 2, "csv"), "c")
+    cache.set(("portfolios", 1), "d")
+
+    cache.invalidate(prefix=("portfolio", 1))
+    assert sorted(evicted) == [(("portfolio", 1, "csv"), "a"), (("portfolio", 1, "xlsx"), "b")]
+    assert cache.get(("portfolio", 2, "csv")) == "c"
+    assert cache.get(("portfolios", 1)) == "d"
+    assert len(cache) == 2
+
+
+def test_invalidate_one_key_or_everything(evicted):
+    cache = make_cache(evicted)
+    cache.set(("a",), 1)
+    cache.set(("b",), 2)
+    cache.invalidate(key=("missing",))
+    assert evicted == []
+    cache.invalidate(key=("a",))
+    assert evicted == [(("a",), 1)]
+    cache.invalidate()
+    assert evicted == [(("a",), 1), (("b",), 2)]
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted(evicted):
+    cache = make_cache(evicted, maxsize=2)
+    cache.set(("a",), 1)
+    cache.set(("b",), 2)
+    assert cache.get(("a",)) == 1
+    cache.set(("c",), 3)
+    assert evicted == [(("b",), 2)]
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == 1 and cache.get(("c",)) == 3
+    assert len(cache) == 2
+
+
+def test_replacing_a_value_evicts_the_old_one(evicted):
+    cache = make_cache(evicted)
+    value = object()
+    cache.set(("a",), value)
+    cache.set(("a",), value)
+    assert evicted == []
+    cache.set(("a",), "new")
+    assert evicted == [(("a",), value)]
+    assert len(cache) == 1
+
+
+def test_expired_entries_are_evicted_on_read(clock, evicted):
+    cache = make_cache(evicted, ttl=10)
+    cache.set(("a",), 1)
+    clock.now += 10
+    assert cache.get(("a",)) == 1
+    clock.now += 11
+    assert cache.get(("a",), "missing") == "missing"
+    assert evicted == [(("a",), 1)]
+    assert len(cache) == 0
+
+
+def test_get_or_set_only_computes_on_a_miss():
+    cache = CacheNamespace("test")
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_set(("a",), factory) == 1
+    assert cache.get_or_set(("a",), factory) == 1
+    assert calls == [1]
+
+
+def test_registry_invalidates_one_namespace():
+    registry = CacheRegistry({"charts": (4, None), "exports": (4, None)})
+    registry["charts"].set(("portfolio", 1), "chart")
+    registry["exports"].set(("portfolio", 1), "export")
+    registry.invalidate("charts", prefix=("portfolio",))
+    assert registry["charts"].get(("portfolio", 1)) is None
+    assert registry["exports"].get(("portfolio", 1)) == "export"
+    assert registry.namespace("queries", maxsize=8).maxsize == 8
@@ -0,0 +1,18 @@
+import os
+
+from cache import CacheNamespace
+from exports import discard_export, read_export
+from portfolio import DISPLAY_COLUMNS, empty_frame
+
+
+def test_read_export_rewrites_a_file_evicted_under_it():
+    cache = CacheNamespace("exports")
+    cache.on_evict = discard_export
+    key = ("portfolio", 1, "csv")
+    first = read_export(cache, key, empty_frame(), "csv")
+    assert first.decode() == ",".join(DISPLAY_COLUMNS) + "\n"
+
+    # Another session's eviction deleted the file, but the entry still points at it
+    os.remove(cache.get(key))
+    assert read_export(cache, key, empty_frame(), "csv") == first
+    cache.invalidate()
@@ -0,0 +1,71 @@
+import time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.auth import crypt, jwt
+
+from id_tokens import SigningKeys, StaticKeySource, user_info_from_claims, verify_id_token
+
+AUDIENCE = "client-id.apps.googleusercontent.com"
+
+
+def rsa_key():
+    """(signer, PEM public key) for a fresh RSA key"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                serialization.NoEncryption()).decode()
+    public = key.public_key().public_bytes(serialization.Encoding.PEM,
+                                           serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+    return crypt.RSASigner.from_string(private, key_id="key-1"), public
+
+
+SIGNER, PUBLIC_KEY = rsa_key()
+
+
+@pytest.fixture
+def keys():
+    return SigningKeys(StaticKeySource({"key-1": PUBLIC_KEY}))
+
+
+def id_token(signer=SIGNER, **claims):
+    now = int(time.time())
+    payload = {"iss": "https://accounts.google.com", "aud": AUDIENCE, "sub": "1234", "email": "analyst@example.com",
+               "email_verified": True, "name": "Analyst", "iat": now, "exp": now + 3600}
+    payload.update(claims)
+    return jwt.encode(signer, payload).decode()
+
+
+def test_valid_token(keys):
+    claims = verify_id_token(id_token(), AUDIENCE, keys)
+    assert user_info_from_claims(claims) == {"id": "1234", "email": "analyst@example.com", "verified_email": True,
+                                             "name": "Analyst"}
+
+
+@pytest.mark.parametrize("claims", [
+    {"aud": "someone-else.apps.googleusercontent.com"},
+    {"iss": "https://evil.example.com"},
+    {"iat": int(time.time()) - 7200, "exp": int(time.time()) - 3600},
+], ids=["wrong-audience", "wrong-issuer", "expired"])
+def test_invalid_claims_are_rejected(keys, claims):
+    with pytest.raises(ValueError):
+        verify_id_token(id_token(**claims), AUDIENCE, keys)
+
+
+def test_tampered_token_is_rejected(keys):
+    header, payload, signature = id_token().split(".")
+    other = id_token(sub="9999").split(".")[1]
+    with pytest.raises(ValueError):
+        verify_id_token(f"{header}.{other}.{signature}", AUDIENCE, keys)
+
+
+def test_token_signed_with_another_key_is_rejected(keys):
+    signer, _ = rsa_key()
+    with pytest.raises(ValueError):
+        verify_id_token(id_token(signer), AUDIENCE, keys)
+
+
+@pytest.mark.parametrize("token", ["", "garbage", "a.b.c", "!!!.###.$$$"])
+def test_garbage_is_rejected(keys, token):
+    with pytest.raises(ValueError):
+        verify_id_token(token, AUDIENCE, keys)
@@ -0,0 +1,95 @@
+import io
+
+import pandas as pd
+import pytest
+
+from identity import normalize_name
+from ingest import FORM_BOUNDS, stream_scored_chunks, validate_chunk
+
+HEADER = "name,current_limit,utilization,payment_history,income,risk_score,months_since_increase,spending_category\n"
+VALID_ROW = "Alice,5000,45,90,60000,700,12,Travel\n"
+
+MARKET_DATA = {"sp500_change": 0.0}
+
+
+def csv(*rows):
+    return pd.read_csv(io.StringIO(HEADER + "".join(rows)))
+
+
+def ingest(*rows, existing_names=None, chunksize=1000):
+    report = {}
+    chunks = list(stream_scored_chunks(io.StringIO(HEADER + "".join(rows)), MARKET_DATA, "tester",
+                                       existing_names=existing_names, fmt="csv", chunksize=chunksize,
+                                       report=report))
+    customers = pd.concat(chunks) if chunks else pd.DataFrame(columns=["name"])
+    return customers, report
+
+
+def test_valid_row_is_accepted():
+    valid, rejected = validate_chunk(csv(VALID_ROW))
+    assert len(valid) == 1 and rejected.empty
+    assert valid["name"].iloc[0] == "Alice"
+
+
+def test_form_defaults_fill_optional_columns():
+    valid, rejected = validate_chunk(pd.read_csv(io.StringIO("name,current_limit,income\nBob,5000,60000\n")))
+    assert rejected.empty
+    assert valid["spending_category"].iloc[0] == "Groceries"
+
+
+def test_missing_required_column_raises():
+    with pytest.raises(ValueError, match="income"):
+        validate_chunk(pd.read_csv(io.StringIO("name,current_limit\nBob,5000\n")))
+
+
+@pytest.mark.parametrize("row, reason", [
+    (" ,5000,45,90,60000,700,12,Travel\n", "missing name"),
+    ("Bob,499,45,90,60000,700,12,Travel\n", "current_limit outside 500-100000"),
+    ("Bob,100001,45,90,60000,700,12,Travel\n", "current_limit outside 500-100000"),
+    ("Bob,5000,101,90,60000,700,12,Travel\n", "utilization outside 0-100"),
+    ("Bob,5000,-1,90,60000,700,12,Travel\n", "utilization outside 0-100"),
+    ("Bob,5000,45,101,60000,700,12,Travel\n", "payment_history outside 0-100"),
+    ("Bob,5000,45,90,24999,700,12,Travel\n", "income outside 25000-500000"),
+    ("Bob,5000,45,90,500001,700,12,Travel\n", "income outside 25000-500000"),
+    ("Bob,5000,45,90,60000,299,12,Travel\n", "risk_score outside 300-850"),
+    ("Bob,5000,45,90,60000,851,12,Travel\n", "risk_score outside 300-850"),
+    ("Bob,5000,45,90,60000,700,121,Travel\n", "months_since_increase outside 0-120"),
+    ("Bob,5000,45,90,60000,abc,12,Travel\n", "risk_score outside 300-850"),
+    ("Bob,5000,45,90,60000,700,12,Crypto\n", "unknown spending_category"),
+    ("Bob,5000,45,90,60000,700.6,12,Travel\n", "risk_score must be a whole number"),
+    ("Bob,5000,45,99.5,60000,700,12,Travel\n", "payment_history must be a whole number"),
+    ("Bob,5000.5,45,90,60000,700,12,Travel\n", "current_limit must be a whole number"),
+])
+def test_rejection_reasons(row, reason):
+    valid, rejected = validate_chunk(csv(VALID_ROW, row))
+    assert valid["name"].tolist() == ["Alice"]
+    assert rejected["reason"].tolist() == [reason]
+
+
+def test_bounds_are_inclusive():
+    low, high = (",".join(str(FORM_BOUNDS[c][i]) for c in HEADER.split(",")[1:-1]) for i in (0, 1))
+    valid, rejected = validate_chunk(csv(f"Low,{low},gas\n", f"High,{high},BUSINESS\n"))
+    assert rejected.empty
+    assert valid["spending_category"].tolist() == ["Gas", "Business"]
+
+
+def test_whole_number_floats_are_accepted():
+    customers, report = ingest("Bob,5000.0,45.0,90.0,60000.0,700.0,12.0,Travel\n")
+    assert report["rejected"] == 0
+    assert customers[["payment_history", "risk_score", "months_since_increase"]].iloc[0].tolist() == [90, 700, 12]
+
+
+def test_duplicates_within_a_file_are_rejected():
+    customers, report = ingest(VALID_ROW, "  ALICE ,6000,45,90,60000,700,12,Travel\n",
+                               "Bob,5000,45,90,60000,700,12,Travel\n", chunksize=2)
+    assert customers["name"].tolist() == ["Alice", "Bob"]
+    assert report["rejected"] == 1
+    assert report["rejected_sample"][0]["reason"] == "duplicate name"
+
+
+def test_duplicates_of_existing_customers_are_rejected():
+    existing = {normalize_name("alice")}
+    customers, report = ingest(VALID_ROW, "Bob,5000,45,90,60000,700,12,Travel\n", existing_names=existing)
+    assert customers["name"].tolist() == ["Bob"]
+    assert report["rejected_sample"][0]["reason"] == "duplicate name"
+    assert normalize_name("bob") in existing
@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import pytest
+
+import market
+from market import MarketDataService, StaticProvider
+from market_store import MarketSnapshotStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 5.0
+
+    def __call__(self):
+        return self.now
+
+
+class FlakyProvider(StaticProvider):
+    """Static closes that fail while ``down`` is set, counting every fetch"""
+
+    def __init__(self):
+        super().__init__()
+        self.down = False
+        self.calls = 0
+
+    def fetch_closes(self, symbol, period):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("provider down")
+        return super().fetch_closes(symbol, period)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(market.time, "monotonic", clock)
+    return clock
+
+
+def make_service(provider, store=None):
+    return MarketDataService(provider, ttl=300, retry_after=30, store=store)
+
+
+def settle(service):
+    """Wait for the refresh get() may have started"""
+    inflight = service._inflight
+    if inflight is not None:
+        inflight.result()
+
+
+def test_stored_snapshot_is_stale_at_startup(tmp_path, clock):
+    store = MarketSnapshotStore(str(tmp_path / "market.db"))
+    store.record({"timestamp": datetime(2024, 1, 1), "sp500_change": 1.0, "vix_level": 18.0,
+                  "treasury_rate": 4.5, "data_source": "static"})
+    provider = FlakyProvider()
+    service = make_service(provider, store)
+
+    assert service.get()["sp500_change"] == 1.0
+    settle(service)
+    assert provider.calls == 3
+    assert service.get()["sp500_change"] == pytest.approx(0.5)
+
+
+def test_failed_fetch_is_retried_after_the_backoff(clock):
+    provider = FlakyProvider()
+    service = make_service(provider)
+    service.refresh().result()
+    calls = provider.calls
+
+    clock.now += 301
+    provider.down = True
+    service.get()
+    settle(service)
+    assert "error" in service.get()
+    assert service.get()["sp500_change"] == pytest.approx(0.5)
+    assert provider.calls == calls + 3
+
+    # A failure is retried after retry_after, not after a whole ttl
+    clock.now += 30
+    service.get()
+    settle(service)
+    assert provider.calls == calls + 3
+    clock.now += 1
+    provider.down = False
+    service.get()
+    settle(service)
+    assert provider.calls == calls + 6
+    assert "error" not in service.get()
+
+    clock.now += 300
+    service.get()
+    settle(service)
+    assert provider.calls == calls + 6
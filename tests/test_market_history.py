@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from market import MarketDataService, StaticProvider
+from market_store import MarketSnapshotStore
+
+START = datetime(2024, 1, 1, 9, 30)
+
+
+def snapshot(minutes, sp500_change, data_source="yfinance"):
+    return {"timestamp": START + timedelta(minutes=minutes), "sp500_change": sp500_change, "vix_level": 18.0,
+            "treasury_rate": 4.5, "data_source": data_source}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MarketSnapshotStore(str(tmp_path / "market.db"))
+    for minutes, change in [(10, 1.5), (0, -2.0), (20, 0.5), (30, -1.0)]:
+        store.record(snapshot(minutes, change))
+    return store
+
+
+def test_history_is_oldest_first_with_market_factor(store):
+    history = store.history()
+    assert history.index.tolist() == [START + timedelta(minutes=m) for m in (0, 10, 20, 30)]
+    assert history["sp500_change"].tolist() == [-2.0, 1.5, 0.5, -1.0]
+    assert history["market_factor"].tolist() == [0.9, 1.1, 1.0, 1.0]
+
+
+def test_history_since_and_limit(store):
+    assert store.history(since=START + timedelta(minutes=10))["sp500_change"].tolist() == [1.5, 0.5, -1.0]
+    # The limit keeps the newest snapshots
+    assert store.history(limit=2)["sp500_change"].tolist() == [0.5, -1.0]
+
+
+def test_simulated_snapshots_are_not_recorded(store):
+    assert not store.record(snapshot(40, 3.0, data_source="simulated"))
+    assert len(store.history()) == 4
+
+
+def test_prune_keeps_newest(store):
+    store.prune(2)
+    assert store.history()["sp500_change"].tolist() == [0.5, -1.0]
+
+
+def test_service_history(tmp_path):
+    assert MarketDataService(StaticProvider()).history() is None
+    store = MarketSnapshotStore(str(tmp_path / "market.db"))
+    service = MarketDataService(StaticProvider({"^GSPC": [5000.0, 5100.0]}), store=store, history_keep=2)
+    for _ in range(3):
+        service.refresh().result()
+    history = service.history()
+    assert len(history) == 2
+    assert history["data_source"].tolist() == ["static", "static"]
+    assert history["sp500_change"].tolist() == pytest.approx([2.0, 2.0])
+    assert history["market_factor"].tolist() == [1.1, 1.1]
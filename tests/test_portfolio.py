@@ -0,0 +1,175 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from portfolio import Portfolio, query_positions
+from portfolio_store import SQLitePortfolioStore
+from scoring import REVENUE_RATE, score_batch
+
+
+def customer(n, utilization, opportunity="Low"):
+    return {
+        "id": f"C{n:06d}",
+        "name": f"Customer {n}",
+        "current_limit": 1000 * n,
+        "recommended_limit": 1500 * n,
+        "utilization": utilization,
+        "payment_history": 95,
+        "income": 8300000,
+        "risk_score": 700,
+        "months_since_increase": 6,
+        "opportunity": opportunity,
+        "rate_reduction": 0.0,
+        "spending_category": "Travel",
+        "category_spend": 500,
+        "market_context": "Normal",
+        "added_by": "tester",
+        "timestamp": datetime(2024, 1, 1),
+    }
+
+
+CUSTOMERS = [customer(1, 0.15, "High"), customer(2, 0.45, "Medium"), customer(3, 0.85, "High")]
+
+
+def assert_stats_match(portfolio, expected):
+    """The running stats equal those of a portfolio built from scratch with the expected rows"""
+    fresh = Portfolio(expected).stats
+    stats = portfolio.stats
+    assert stats.count == fresh.count
+    assert stats.total_limit == fresh.total_limit
+    assert stats.total_recommended == fresh.total_recommended
+    assert stats.utilization_sum == pytest.approx(fresh.utilization_sum)
+    assert stats.opportunity_counts == fresh.opportunity_counts
+    assert stats.utilization_bins.tolist() == fresh.utilization_bins.tolist()
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def portfolio(request, tmp_path):
+    store = SQLitePortfolioStore(str(tmp_path / "portfolio.db")) if request.param == "sqlite" else None
+    portfolio = Portfolio(store=store)
+    portfolio.append(CUSTOMERS)
+    return portfolio
+
+
+def test_remove_updates_stats(portfolio):
+    assert portfolio.remove(["C000002", "C999999"]) == 1
+    assert "C000002" not in portfolio
+    assert not portfolio.has_name("customer 2")
+    assert_stats_match(portfolio, [CUSTOMERS[0], CUSTOMERS[2]])
+    assert portfolio.get("C000003")["name"] == "Customer 3"
+
+
+def test_remove_drops_approvals_of_removed_customers(portfolio):
+    portfolio.approve_many(["C000001", "C000003"])
+    portfolio.remove(["C000003"])
+    assert portfolio.stats.approved_count == 1
+    assert portfolio.stats.approved_revenue == pytest.approx((1500 - 1000) * REVENUE_RATE)
+
+
+def test_remove_unknown_ids_is_a_no_op(portfolio):
+    version = portfolio.version
+    assert portfolio.remove(["C999999"]) == 0
+    assert portfolio.version == version
+    assert_stats_match(portfolio, CUSTOMERS)
+
+
+def test_rescore_updates_scores_and_market_context(portfolio):
+    portfolio.rescore({"sp500_change": 0.0}, "Updated during +0.0% market day")
+    before = portfolio.frame.copy()
+    version = portfolio.version
+    diff = portfolio.rescore({"sp500_change": 0.0}, "Updated during +0.4% market day")
+    assert diff.empty
+    assert portfolio.version == version
+    assert portfolio.frame.equals(before)
+
+    portfolio.rescore({"sp500_change": -2.0}, "Updated during -2.0% market day")
+    expected = score_batch(before, {"sp500_change": -2.0})
+    assert portfolio.frame["recommended_limit"].tolist() == expected["recommended_limit"].tolist()
+    assert portfolio.frame["recommended_limit"].tolist() != before["recommended_limit"].tolist()
+    moved = portfolio.frame["recommended_limit"] != before["recommended_limit"]
+    assert set(portfolio.frame["market_context"][moved]) == {"Updated during -2.0% market day"}
+    assert set(portfolio.frame["market_context"][~moved]) <= {"Updated during +0.0% market day"}
+    if portfolio.store is not None:
+        reloaded = Portfolio(store=portfolio.store).frame
+        pd.testing.assert_frame_equal(reloaded.drop(columns="timestamp"), portfolio.frame.drop(columns="timestamp"),
+                                      check_categorical=False)
+
+
+def test_reapproving_a_new_recommendation_replaces_its_revenue(portfolio):
+    assert portfolio.approve("C000001")
+    assert not portfolio.approve("C000001")
+    portfolio.update_columns({"recommended_limit": [2500]}, [0])
+    assert not portfolio.is_approved("C000001")
+    assert portfolio.approve("C000001")
+    assert portfolio.stats.approved_count == 1
+    assert portfolio.stats.approved_revenue == pytest.approx((2500 - 1000) * REVENUE_RATE)
+    if portfolio.store is not None:
+        reloaded = Portfolio(store=portfolio.store).stats
+        assert reloaded.approved_count == 1
+        assert reloaded.approved_revenue == pytest.approx(portfolio.stats.approved_revenue)
+
+
+def test_sync_patches_in_another_processes_writes(tmp_path, monkeypatch):
+    store = SQLitePortfolioStore(str(tmp_path / "portfolio.db"))
+    others = [customer(n, 0.5) for n in range(5, 11)]
+    writer = Portfolio(CUSTOMERS + others, store=store)
+    reader = Portfolio(store=SQLitePortfolioStore(store.path))
+    assert not reader.sync()
+
+    monkeypatch.setattr(reader.store, "load", lambda: pytest.fail("sync reloaded the whole store"))
+    writer.append([customer(4, 0.55, "Medium")])
+    writer.update_columns({"recommended_limit": [9000], "opportunity": ["Low"]}, [0])
+    writer.remove(["C000002"])
+    writer.approve_many(["C000001", "C000004"])
+    assert reader.sync()
+
+    expected = [dict(CUSTOMERS[0], recommended_limit=9000, opportunity="Low"), CUSTOMERS[2],
+                customer(4, 0.55, "Medium")] + others
+    assert sorted(reader.frame["id"]) == sorted(c["id"] for c in expected)
+    assert reader.get("C000001")["recommended_limit"] == 9000
+    assert not reader.has_name("customer 2") and reader.has_name("customer 4")
+    assert_stats_match(reader, expected)
+    assert reader.stats.approved_count == 2
+    assert reader.stats.approved_revenue == pytest.approx(writer.stats.approved_revenue)
+    assert reader.is_approved("C000004")
+
+
+def test_sync_reloads_after_another_process_clears(tmp_path):
+    store = SQLitePortfolioStore(str(tmp_path / "portfolio.db"))
+    writer = Portfolio(CUSTOMERS, store=store)
+    reader = Portfolio(store=SQLitePortfolioStore(store.path))
+    writer.clear()
+    writer.append([customer(4, 0.55)])
+    assert reader.sync()
+    assert reader.frame["id"].tolist() == ["C000004"]
+    assert_stats_match(reader, [customer(4, 0.55)])
+
+
+def test_query_filters_by_category_and_owner():
+    frame = Portfolio(CUSTOMERS + [dict(customer(4, 0.3, "Medium"), added_by="other")]).frame
+    assert query_positions(frame).tolist() == [0, 1, 2, 3]
+    assert query_positions(frame, opportunity=["High"]).tolist() == [0, 2]
+    assert query_positions(frame, opportunity=[]).tolist() == [0, 1, 2, 3]
+    assert query_positions(frame, added_by={"other"}).tolist() == [3]
+    assert query_positions(frame, spending_category=["Dining"]).tolist() == []
+    assert query_positions(frame, opportunity=["Medium"], added_by=["tester"]).tolist() == [1]
+
+
+def test_query_risk_range_is_inclusive():
+    frame = Portfolio([dict(customer(n, 0.5), risk_score=score)
+                       for n, score in enumerate([599, 600, 700, 750, 751], start=1)]).frame
+    assert query_positions(frame, risk_range=(600, 750)).tolist() == [1, 2, 3]
+    assert query_positions(frame, risk_range=(700, 700)).tolist() == [2]
+    assert query_positions(frame, risk_range=(600, 750), opportunity=["High"]).tolist() == []
+
+
+def test_query_sorts_numbers_and_categories():
+    frame = Portfolio([customer(1, 0.6, "High"), customer(2, 0.2, "Low"), customer(3, 0.4, "Medium"),
+                       customer(4, 0.2, "High")]).frame
+    assert query_positions(frame, sort_by="utilization").tolist() == [1, 3, 2, 0]
+    assert query_positions(frame, sort_by="utilization", ascending=False).tolist() == [0, 2, 3, 1]
+    # Categoricals sort in category order (Low < Medium < High), not alphabetically
+    assert query_positions(frame, sort_by="opportunity").tolist() == [1, 2, 0, 3]
+    assert query_positions(frame, opportunity=["High", "Low"], sort_by="current_limit",
+                           ascending=False).tolist() == [3, 1, 0]
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from portfolio import UTILIZATION_BIN_EDGES, PortfolioStats
+
+
+def rows(utilization):
+    n = len(utilization)
+    return pd.DataFrame({
+        "current_limit": [1000] * n,
+        "recommended_limit": [1000] * n,
+        "utilization": pd.Series(utilization, dtype="float32"),
+        "opportunity": ["Low"] * n,
+    })
+
+
+def test_utilization_on_bin_edges_lands_in_upper_bin():
+    stats = PortfolioStats()
+    edges = UTILIZATION_BIN_EDGES[:-1] / 100
+    stats.add(rows(edges))
+    assert stats.utilization_bins.tolist() == [1] * len(edges)
+
+
+def test_utilization_bins_match_unrounded_percentages():
+    stats = PortfolioStats()
+    values = [0.0, 0.1, 0.299, 0.3, 0.696, 0.7, 0.9, 0.95, 1.0]
+    stats.add(rows(values))
+    expected, _ = np.histogram(np.array([0, 10, 29.9, 30, 69.6, 70, 90, 95, 100]), bins=UTILIZATION_BIN_EDGES)
+    assert stats.utilization_bins.tolist() == expected.tolist()
+
+
+def test_remove_reverses_add():
+    stats = PortfolioStats()
+    stats.add(rows([0.2, 0.7]))
+    stats.remove(rows([0.7]))
+    assert stats.utilization_bins.sum() == 1
+    assert stats.utilization_bins[2] == 1
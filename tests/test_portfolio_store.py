@@ -0,0 +1,88 @@
+from datetime import datetime
+
+import pytest
+
+from portfolio import Portfolio
+from portfolio_store import SQLitePortfolioStore, StoredAnalyses
+
+
+def customer(n):
+    return {
+        "id": f"C{n:06d}", "name": f"Customer {n}", "current_limit": 1000, "recommended_limit": 1500,
+        "utilization": 0.3, "payment_history": 95, "income": 8300000, "risk_score": 700,
+        "months_since_increase": 6, "opportunity": "Medium", "rate_reduction": 0.0, "spending_category": "Travel",
+        "category_spend": 500, "market_context": "Normal", "added_by": "tester", "timestamp": datetime(2024, 1, 1),
+    }
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "portfolio.db")
+
+
+def tombstones(store, table="deleted_customers"):
+    with store.pool.connection() as conn:
+        return sorted(row[0] for row in conn.execute(f"SELECT * FROM {table}"))
+
+
+def test_analyses_sync_patches_in_another_processes_writes(path, monkeypatch):
+    writer = StoredAnalyses(SQLitePortfolioStore(path))
+    writer.update({"C000001": "one", "C000002": "two"})
+    reader = StoredAnalyses(SQLitePortfolioStore(path))
+    monkeypatch.setattr(reader.store, "load_analyses", lambda: pytest.fail("sync reloaded every analysis"))
+
+    writer["C000003"] = "three"
+    writer["C000001"] = "one, revised"
+    del writer["C000002"]
+    reader.sync()
+    assert dict(reader) == {"C000001": "one, revised", "C000003": "three"}
+    assert reader.version == writer.version
+
+    # A write racing another process's write picks that one up too
+    writer["C000004"] = "four"
+    reader["C000005"] = "five"
+    assert dict(reader) == {"C000001": "one, revised", "C000003": "three", "C000004": "four", "C000005": "five"}
+
+
+def test_analyses_sync_reloads_after_a_clear(path):
+    writer = StoredAnalyses(SQLitePortfolioStore(path))
+    writer.update({"C000001": "one"})
+    reader = StoredAnalyses(SQLitePortfolioStore(path))
+    writer.clear()
+    writer["C000002"] = "two"
+    reader.sync()
+    assert dict(reader) == {"C000002": "two"}
+
+
+def test_tombstones_are_pruned_once_every_live_reader_has_seen_them(path):
+    store = SQLitePortfolioStore(path)
+    writer = Portfolio([customer(n) for n in range(1, 6)], store=store)
+    reader = Portfolio(store=SQLitePortfolioStore(path))
+
+    writer.remove(["C000001"])
+    writer.sync()
+    writer.remove(["C000002"])
+    # The reader hasn't synced, so it still needs both tombstones
+    assert tombstones(store) == ["C000001", "C000002"]
+
+    reader.sync()
+    writer.sync()
+    writer.remove(["C000003"])
+    assert tombstones(store) == ["C000003"]
+    reader.sync()
+    assert sorted(reader.frame["id"]) == ["C000004", "C000005"]
+
+
+def test_reader_that_went_quiet_reloads_after_pruning(path):
+    store = SQLitePortfolioStore(path)
+    writer = Portfolio([customer(n) for n in range(1, 6)], store=store)
+    quiet = Portfolio(store=SQLitePortfolioStore(path))
+    with store.pool.transaction() as conn:
+        conn.execute("UPDATE readers SET seen_at = 0 WHERE reader = ?", (quiet.uid,))
+
+    writer.remove(["C000001"])
+    writer.sync()
+    writer.remove(["C000002"])
+    assert tombstones(store) == ["C000002"]
+    assert quiet.sync()
+    assert sorted(quiet.frame["id"]) == ["C000003", "C000004", "C000005"]
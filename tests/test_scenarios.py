@@ -0,0 +1,52 @@
+from itertools import product
+
+import pandas as pd
+import pytest
+
+from scenarios import SCENARIO_COLUMNS, run_scenarios, scenario_grid
+from scoring import USD_TO_INR, score_batch
+
+# Customers either side of the utilization, income, risk and tenure clamps in the limit model
+CURRENT_LIMITS = [1000, 5000]
+UTILIZATIONS = [0, 50, 71, 100]
+INCOMES = [20000, 100000]
+RISK_SCORES = [300, 465, 850]
+MONTHS = [0, 18]
+SP500_CHANGES = [-2.0, -1.0, 0.0, 1.01, 3.0]
+CALM_VIX_LEVELS = [10.0, 20.0]  # No volatility cut up to the baseline
+
+
+@pytest.fixture
+def customers():
+    grid = list(product(CURRENT_LIMITS, UTILIZATIONS, INCOMES, RISK_SCORES, MONTHS))
+    df = pd.DataFrame(grid, columns=["current_limit", "utilization", "income", "risk_score", "months_since_increase"])
+    df["current_limit"] = (df["current_limit"] * USD_TO_INR).astype(int)
+    df["income"] = (df["income"] * USD_TO_INR).astype(int)
+    df["utilization"] = df["utilization"] / 100
+    df["payment_history"] = 95
+    return df
+
+
+@pytest.mark.parametrize("max_cells", [4_000_000, 100])
+def test_calm_scenarios_match_score_batch(customers, max_cells):
+    results = run_scenarios(customers, scenario_grid(SP500_CHANGES, CALM_VIX_LEVELS), max_cells=max_cells)
+    assert results.columns.tolist() == SCENARIO_COLUMNS
+    assert len(results) == len(SP500_CHANGES) * len(CALM_VIX_LEVELS)
+    for row in results.itertuples():
+        scored = score_batch(customers, {"sp500_change": row.sp500_change})
+        tiers = scored["opportunity"].value_counts()
+        assert row.total_recommended == scored["recommended_limit"].sum()
+        assert (row.high, row.medium, row.low) == (tiers["High"], tiers["Medium"], tiers["Low"])
+        assert row.limit_increase == (scored["recommended_limit"] - customers["current_limit"]).sum()
+
+
+def test_high_vix_and_rate_rise_reduce_revenue(customers):
+    calm, stressed = run_scenarios(customers, scenario_grid([0.0], [20.0, 40.0], [0.0, 2.0])).iloc[[0, 3]].itertuples()
+    assert stressed.limit_factor < calm.limit_factor
+    assert stressed.total_recommended <= calm.total_recommended
+    assert stressed.revenue_rate < calm.revenue_rate
+
+
+def test_more_customers_than_max_cells_raises(customers):
+    with pytest.raises(ValueError):
+        run_scenarios(customers, scenario_grid([0.0], [20.0]), max_cells=len(customers) - 1)
@@ -0,0 +1,63 @@
+from itertools import product
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scoring import USD_TO_INR, opportunity_tier, score_batch
+
+
+def reference_score(current_limit, utilization, payment_history, income, risk_score, months_since_increase,
+                    sp500_change):
+    """The original per-customer formula from the add-customer form (limit and income in USD, utilization in %)"""
+    utilization_decimal = utilization / 100
+    utilization_factor = max(0.5, 1 - utilization_decimal) if utilization_decimal > 0.7 else 1.2
+    income_factor = min(2.0, income / 50000)
+    risk_factor = max(0.3, (risk_score - 300) / 550)
+    time_factor = min(1.3, 1 + (months_since_increase / 60))
+
+    market_factor = 1.0
+    if sp500_change > 1: market_factor = 1.1
+    elif sp500_change < -1: market_factor = 0.9
+
+    current_limit_inr = int(current_limit * USD_TO_INR)
+
+    recommended_limit_inr = int(current_limit_inr * utilization_factor * income_factor * risk_factor * time_factor * market_factor)
+    recommended_limit_inr = max(current_limit_inr, recommended_limit_inr)
+    rate_reduction = max(0, (payment_history - 80) * 0.05 + (risk_score - 600) * 0.01)
+
+    increase_percentage = (recommended_limit_inr - current_limit_inr) / current_limit_inr
+    opportunity = "High" if increase_percentage > 0.3 else ("Medium" if increase_percentage > 0.1 else "Low")
+    return recommended_limit_inr, rate_reduction, opportunity
+
+
+# Values on and either side of every clamp and threshold in the formula
+CURRENT_LIMITS = [1000, 5000]
+UTILIZATIONS = [0, 50, 70, 71, 90, 100]  # factor switches above 70%, floors at 0.5
+PAYMENT_HISTORIES = [0, 80, 100]
+INCOMES = [20000, 99999, 100000, 150000]  # income factor caps at 2.0 from $100k
+RISK_SCORES = [300, 464, 465, 466, 850]  # risk factor floors at 0.3 below 465
+MONTHS = [0, 17, 18, 19, 120]  # time factor caps at 1.3 from 18 months
+SP500_CHANGES = [-1.5, -1.0, -0.99, 0.0, 1.0, 1.01, 2.0]  # market factor moves only strictly past +/-1%
+
+
+@pytest.mark.parametrize("sp500_change", SP500_CHANGES)
+def test_score_batch_matches_per_customer_formula(sp500_change):
+    grid = list(product(CURRENT_LIMITS, UTILIZATIONS, PAYMENT_HISTORIES, INCOMES, RISK_SCORES, MONTHS))
+    df = pd.DataFrame(grid, columns=["current_limit", "utilization", "payment_history", "income", "risk_score",
+                                     "months_since_increase"])
+    df["current_limit"] = (df["current_limit"] * USD_TO_INR).astype(int)
+    df["income"] = (df["income"] * USD_TO_INR).astype(int)
+    df["utilization"] = df["utilization"] / 100
+
+    scored = score_batch(df, {"sp500_change": sp500_change})
+    expected = [reference_score(*row, sp500_change) for row in grid]
+
+    assert scored["recommended_limit"].tolist() == [limit for limit, _, _ in expected]
+    assert scored["rate_reduction"].to_numpy() == pytest.approx([rate for _, rate, _ in expected])
+    assert scored["opportunity"].astype(str).tolist() == [tier for _, _, tier in expected]
+
+
+def test_opportunity_tier_boundaries():
+    increases = np.array([0.0, 0.1, np.nextafter(0.1, 1), 0.3, np.nextafter(0.3, 1), 1.0])
+    assert opportunity_tier(increases).tolist() == ["Low", "Low", "Medium", "Medium", "High", "High"]
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from config import DEFAULT_SECRET_KEY
+from sessions import SessionStore, sign_token, verify_token
+
+SECRET = "test-secret"
+USER = {"name": "Analyst", "email": "analyst@example.com"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / "sessions.db"), SECRET)
+
+
+def test_create_and_resume(store):
+    token, expires_at = store.create(USER)
+    session = store.resume(token)
+    assert session["user_info"] == USER
+    assert session["expires_at"] == expires_at
+
+
+def test_tampered_signature_is_rejected(store):
+    token, _ = store.create(USER)
+    session_id, expires_at, signature = token.split(".")
+    forged = f"{session_id}.{expires_at}.{'0' * len(signature)}"
+    assert verify_token(SECRET, forged) is None
+    assert store.resume(forged) is None
+    # Pushing the expiry out invalidates the signature too
+    assert store.resume(f"{session_id}.{int(expires_at) + 3600}.{signature}") is None
+
+
+def test_token_signed_with_another_secret_is_rejected(store):
+    token, _ = store.create(USER)
+    session_id, expires_at, _ = token.split(".")
+    assert store.resume(sign_token("other-secret", session_id, int(expires_at))) is None
+
+
+def test_expired_token_is_rejected(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.db"), SECRET, ttl=60)
+    token, expires_at = store.create(USER)
+    assert verify_token(SECRET, token, now=expires_at - 1) is not None
+    assert verify_token(SECRET, token, now=expires_at) is None
+    expired = sign_token(SECRET, token.split(".")[0], time.time() - 1)
+    assert store.resume(expired) is None
+
+
+def test_revoked_session_is_rejected(store):
+    token, _ = store.create(USER)
+    other, _ = store.create(USER)
+    store.revoke(token)
+    assert store.resume(token) is None
+    assert store.resume(other) is not None
+
+
+@pytest.mark.parametrize("token", ["", "garbage", "a.b", "a.b.c.d", "id.notanumber.sig", None, 12345])
+def test_malformed_token_is_rejected(store, token):
+    assert verify_token(SECRET, token) is None
+    assert store.resume(token) is None
+    store.revoke(token)
+
+
+@pytest.mark.parametrize("secret", ["", None, DEFAULT_SECRET_KEY])
+def test_placeholder_secret_is_refused(tmp_path, secret):
+    with pytest.raises(ValueError):
+        SessionStore(str(tmp_path / "sessions.db"), secret)
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from simulation import PERCENTILES, bucket_portfolio, simulate_revenue
+
+
+@pytest.fixture
+def customers():
+    rng = np.random.default_rng(7)
+    n = 500
+    current = rng.integers(50_000, 500_000, n)
+    return pd.DataFrame({
+        "current_limit": current,
+        "recommended_limit": current + rng.integers(0, 200_000, n),
+        "utilization": rng.uniform(0, 1, n),
+        "risk_score": rng.integers(300, 851, n),
+    })
+
+
+def test_buckets_cover_every_customer(customers):
+    buckets = bucket_portfolio(customers)
+    assert buckets["customers"].sum() == len(customers)
+    assert buckets["limit_increase"].sum() == pytest.approx(
+        (customers["recommended_limit"] - customers["current_limit"]).sum())
+    assert ((buckets["default_rate"] > 0) & (buckets["default_rate"] < 1)).all()
+
+
+def test_same_seed_gives_same_result_for_any_worker_count(customers):
+    buckets = bucket_portfolio(customers)
+    bands, per_bucket = simulate_revenue(buckets, paths=3000, seed=11, workers=1)
+    parallel_bands, parallel_per_bucket = simulate_revenue(buckets, paths=3000, seed=11, workers=2)
+    pd.testing.assert_frame_equal(bands, parallel_bands)
+    pd.testing.assert_frame_equal(per_bucket, parallel_per_bucket)
+    assert not simulate_revenue(buckets, paths=3000, seed=12)[0].equals(bands)
+
+
+def test_percentiles_are_ordered(customers):
+    bands, _ = simulate_revenue(bucket_portfolio(customers), horizon=12, paths=2500, seed=3)
+    columns = [f"p{p}" for p in PERCENTILES]
+    assert bands.index.tolist() == list(range(1, 13))
+    assert (np.diff(bands[columns].to_numpy(), axis=1) >= 0).all()
+    assert ((bands["mean"] >= bands["p5"]) & (bands["mean"] <= bands["p95"])).all()